@@ -1,5 +1,15 @@
-from .types import Interface, Object, Union, Enum, Input, field, context
+from .types import (
+    Interface,
+    Object,
+    Union,
+    Enum,
+    Input,
+    field,
+    context,
+    SelectionInfo
+)
 from .introspection import Query
+from .loader import Loader
 try:
     import starlette  # noqa
     from .view import Schema, SubscribableSchema
@@ -21,5 +31,7 @@ __all__ = [
     'field',
     'Query',
     'context',
+    'Loader',
+    'SelectionInfo',
     'SubscribableSchema'
 ]
@@ -1,7 +1,10 @@
 import typing
 import dataclasses
-from typing import Any, Optional, Mapping, List
-from graphql.language.ast import OperationDefinitionNode
+from typing import Any, Optional, Mapping, List, Dict
+from graphql.language.ast import (
+    OperationDefinitionNode,
+    FragmentDefinitionNode
+)
 
 
 if typing.TYPE_CHECKING:
@@ -14,3 +17,11 @@ class Context:
     root_ast: List[OperationDefinitionNode]
     request: Optional[Any] = None
     variables: Optional[Mapping[str, Any]] = None
+    fragments: Mapping[str, FragmentDefinitionNode] = dataclasses.field(
+        default_factory=dict
+    )
+    loaders: Dict[type, Any] = dataclasses.field(default_factory=dict)
+    variable_values: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    argument_values: Dict[int, Dict[str, Any]] = dataclasses.field(
+        default_factory=dict
+    )
@@ -3,7 +3,7 @@ class ValidationError(Exception):
 
 
 class RuntimeError(Exception):
-    def __init__(self, message, node, path):
+    def __init__(self, message, node, path=[]):
         super().__init__(message)
         self.location = node.loc.source.get_location(node.loc.start)
         self.path = path
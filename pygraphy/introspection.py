@@ -1,5 +1,6 @@
 import inspect
 import json
+import functools
 from typing import List, Optional
 from .types import (
     Enum,
@@ -24,6 +25,23 @@ from .utils import (
 )
 
 
+def memoized(method):
+    """
+    Cache the result of resolver in the introspection object, which does
+    not change once the schema is built.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(kwargs.items()))
+        memo = getattr(self, '_memo', None)
+        if memo is None:
+            memo = self._memo = {}
+        if key not in memo:
+            memo[key] = method(self, *args, **kwargs)
+        return memo[key]
+    return wrapper
+
+
 @meta
 class DirectiveLocation(Enum):
     QUERY = 0
@@ -48,6 +66,8 @@ class DirectiveLocation(Enum):
 
 @meta
 class Directive(Object):
+    __compact__ = True
+
     name: str
     description: Optional[str]
     locations: List[DirectiveLocation]
@@ -68,6 +88,8 @@ class TypeKind(Enum):
 
 @meta
 class EnumValue(Object):
+    __compact__ = True
+
     name: str
     description: Optional[str]
     is_deprecated: bool
@@ -76,6 +98,8 @@ class EnumValue(Object):
 
 @meta
 class InputValue(Object):
+    __compact__ = True
+    __slots__ = ('_name', 'param', '_param', '_memo')
 
     @field
     def name(self) -> str:
@@ -90,9 +114,7 @@ class InputValue(Object):
 
     @field
     def type(self) -> 'Type':
-        t = Type()
-        t._type = self.param
-        return t
+        return get_type(self.param)
 
     @field
     def default_value(self) -> Optional[str]:
@@ -105,6 +127,8 @@ class InputValue(Object):
 
 @meta
 class Field(Object):
+    __compact__ = True
+    __slots__ = ('_field', '_memo')
 
     @field
     def name(self) -> str:
@@ -115,6 +139,7 @@ class Field(Object):
         return self._field.description
 
     @field
+    @memoized
     def args(self) -> List[InputValue]:
         if not isinstance(self._field, ResolverField):
             return []
@@ -129,9 +154,7 @@ class Field(Object):
 
     @field
     def type(self) -> 'Type':
-        t = Type()
-        t._type = self._field.ftype
-        return t
+        return get_type(self._field.ftype)
 
     @field
     def is_deprecated(self) -> bool:
@@ -150,8 +173,11 @@ class Field(Object):
 
 @meta
 class Type(Object):
+    __compact__ = True
+    __slots__ = ('_type', '_memo')
 
     @field
+    @memoized
     def name(self) -> Optional[str]:
         if not is_optional(self._type):
             return None
@@ -160,6 +186,7 @@ class Type(Object):
         return print_type(self.type, nonnull=False)
 
     @field
+    @memoized
     def kind(self) -> TypeKind:
         if not is_optional(self._type):
             return TypeKind.NON_NULL
@@ -180,10 +207,12 @@ class Type(Object):
             return TypeKind.INPUT_OBJECT
 
     @field
+    @memoized
     def description(self) -> Optional[str]:
         return self.type.__description__ if hasattr(self.type, '__description__') else self.type.__doc__
 
     @field
+    @memoized
     def interfaces(self) -> Optional[List['Type']]:
         """
         OBJECT only
@@ -194,13 +223,12 @@ class Type(Object):
             interfaces = []
             for base in self.type.__bases__:
                 if issubclass(base, Interface):
-                    t = Type()
-                    t._type = Optional[base]
-                    interfaces.append(t)
+                    interfaces.append(get_type(Optional[base]))
             return interfaces
         return None
 
     @field
+    @memoized
     def possible_types(self) -> Optional[List['Type']]:
         """
         INTERFACE and UNION only
@@ -210,20 +238,17 @@ class Type(Object):
         if issubclass(self.type, Interface):
             types = []
             for subclass in self.type.__subclasses__():
-                t = Type()
-                t._type = Optional[subclass]
-                types.append(t)
+                types.append(get_type(Optional[subclass]))
             return types
         if issubclass(self.type, Union):
             types = []
             for member in list(self.type.members):
-                t = Type()
-                t._type = Optional[member]
-                types.append(t)
+                types.append(get_type(Optional[member]))
             return types
         return None
 
     @field
+    @memoized
     def input_fields(self) -> Optional[List[InputValue]]:
         """
         INPUT_OBJECT only
@@ -241,22 +266,20 @@ class Type(Object):
         return None
 
     @field
+    @memoized
     def of_type(self) -> Optional['Type']:
         """
         NON_NULL and LIST only
         """
         if not is_optional(self._type):
-            of = Type()
-            of._type = Optional[self._type]
-            return of
+            return get_type(Optional[self._type])
 
         if is_list(self._type.__args__[0]):
-            of = Type()
-            of._type = self._type.__args__[0].__args__[0]
-            return of
+            return get_type(self._type.__args__[0].__args__[0])
         return None
 
     @field
+    @memoized
     def enum_values(self, include_deprecated: Optional[bool] = False) -> Optional[List[EnumValue]]:
         """
         ENUM only
@@ -277,6 +300,7 @@ class Type(Object):
             ) for i in values]
 
     @field
+    @memoized
     def fields(self, include_deprecated: Optional[bool] = False) -> Optional[List[Field]]:
         """
         OBJECT and INTERFACE only
@@ -302,6 +326,7 @@ class Type(Object):
 
 @meta
 class Schema(Object):
+    __compact__ = True
 
     @field
     def directives(self) -> List[Directive]:
@@ -313,9 +338,7 @@ class Schema(Object):
         The type that query operations will be rooted at.
         """
         schema = context.get().schema
-        type = Type()
-        type._type = schema.__fields__['query'].ftype
-        return type
+        return get_type(schema.__fields__['query'].ftype)
 
     @field
     def mutation_type(self) -> Optional[Type]:
@@ -325,9 +348,7 @@ class Schema(Object):
         schema = context.get().schema
         if 'mutation' not in schema.__fields__:
             return None
-        type = Type()
-        type._type = schema.__fields__['mutation'].ftype
-        return type
+        return get_type(schema.__fields__['mutation'].ftype)
 
     @field
     def subscription_type(self) -> Optional[Type]:
@@ -338,35 +359,57 @@ class Schema(Object):
 
     @field
     def types(self) -> List[Type]:
-        types = []
-        self.init_scalars(types)
-        for t in context.get().schema.registered_type:
-            type = Type()
-            type._type = Optional[t]
-            types.append(type)
-        return types
-
-    @staticmethod
-    def init_scalars(types):
-        scalars = [int, float, str, bool]
-        for scalar in scalars:
-            t = Type()
-            t._type = Optional[scalar]
-            types.append(t)
-        return types
+        return list(get_snapshot(context.get().schema).types.values())
 
 
 class Query(Object):
 
     @metafield
     def _type(self, name: str) -> Optional[Type]:
-        return None
+        return get_snapshot(context.get().schema).types.get(name)
 
     @metafield
     def _schema(self) -> Schema:
         return Schema()
 
 
+class Snapshot:
+    """
+    The introspection types of a schema indexed by name, they are built
+    once and the results of their resolvers are memoized, so introspection
+    does not need to inspect the Python types again.
+    """
+
+    def __init__(self, schema):
+        self.types = {}
+        for ptype in [int, float, str, bool] + list(schema.registered_type):
+            type = Type()
+            type._type = Optional[ptype]
+            self.types[print_type(ptype, nonnull=False)] = type
+
+
+def get_snapshot(schema):
+    snapshot = schema.__dict__.get('introspection_snapshot')
+    if snapshot is None:
+        snapshot = schema.introspection_snapshot = Snapshot(schema)
+    return snapshot
+
+
+def get_type(ptype):
+    """
+    Return the introspection type of a type annotation, the named types
+    are taken from the snapshot of current schema.
+    """
+    if is_optional(ptype) and not is_list(ptype.__args__[0]):
+        snapshot = get_snapshot(context.get().schema)
+        type = snapshot.types.get(print_type(ptype, nonnull=False))
+        if type is not None and type._type == ptype:
+            return type
+    type = Type()
+    type._type = ptype
+    return type
+
+
 class WithMetaSchema(BaseSchema):
     query: Optional[Query]
 
@@ -0,0 +1,91 @@
+import asyncio
+from abc import abstractmethod, ABC
+from .types import context
+
+
+class Loader(ABC):
+    """
+    Batch and deduplicate the loads of a request, the keys loaded in the
+    same tick of event loop are sent to `batch_load` together.
+    """
+
+    MAX_BATCH_SIZE = None
+    CACHE = True
+
+    def __init__(self):
+        self.cache = {}
+        self.pending = {}
+
+    @classmethod
+    def get(cls):
+        """
+        Return the loader instance of current request.
+        """
+        loaders = context.get().loaders
+        loader = loaders.get(cls)
+        if loader is None:
+            loader = loaders[cls] = cls()
+        return loader
+
+    @abstractmethod
+    async def batch_load(self, keys):
+        """
+        Return a list of values (or exceptions) in the same order of keys.
+        """
+
+    def load(self, key):
+        future = self.cache.get(key) or self.pending.get(key)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        if not self.pending:
+            loop.call_soon(self.dispatch)
+        self.pending[key] = future
+        if self.CACHE:
+            self.cache[key] = future
+        return future
+
+    def load_many(self, keys):
+        return asyncio.gather(*[self.load(key) for key in keys])
+
+    def clear(self, key=None):
+        if key is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(key, None)
+
+    def dispatch(self):
+        pending, self.pending = self.pending, {}
+        keys = list(pending.keys())
+        size = self.MAX_BATCH_SIZE or len(keys)
+        for start in range(0, len(keys), size):
+            batch = keys[start:start + size]
+            asyncio.ensure_future(
+                self.__load_batch(batch, [pending[key] for key in batch])
+            )
+
+    async def __load_batch(self, keys, futures):
+        try:
+            values = await self.batch_load(keys)
+            if len(values) != len(keys):
+                raise ValueError(
+                    f'{type(self).__name__}.batch_load must return a list'
+                    f' with the same length of keys'
+                )
+        except Exception as e:
+            for key, future in zip(keys, futures):
+                self.cache.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future, value in zip(keys, futures, values):
+            if future.done():
+                continue
+            if isinstance(value, Exception):
+                self.cache.pop(key, None)
+                future.set_exception(value)
+            else:
+                future.set_result(value)
@@ -0,0 +1,377 @@
+import asyncio
+import logging
+from abc import abstractmethod, ABC
+from collections import deque
+
+
+_END = object()
+
+
+class Socket(ABC):
+
+    @abstractmethod
+    async def send(self, text: str):
+        pass
+
+    @abstractmethod
+    async def receive(self) -> str:
+        pass
+
+    @abstractmethod
+    async def close(self):
+        pass
+
+
+class QueuedSocket(Socket):
+    """
+    Send the messages of a socket from a bounded queue in background, so
+    a slow client does not block the subscriptions. Once the queue is
+    full, the policy decides what to do with a new data message:
+
+    - drop_oldest: drop the oldest data message in the queue.
+    - conflate: replace the queued data message of the same subscription,
+      or drop the oldest one if there is no such message.
+    - disconnect: close the connection.
+
+    The messages without key, such as acknowledgements and completions,
+    are never dropped, but they count toward the size too, a data message
+    is dropped for them, or the client is disconnected if the queue is
+    full of them. `on_disconnect` is called once the slow client is
+    disconnected, so the owner of socket can stop serving it.
+    """
+
+    POLICIES = {'drop_oldest', 'conflate', 'disconnect'}
+
+    def __init__(self, socket, maxsize, policy='drop_oldest'):
+        if policy not in self.POLICIES:
+            raise ValueError(
+                f'The policy must be one of {self.POLICIES},'
+                f' rather than {policy}'
+            )
+        self.socket = socket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.stopping = False
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.on_disconnect = None
+        self.writer = asyncio.ensure_future(self.write())
+
+    async def send(self, text, key=None):
+        if self.closed:
+            raise RuntimeError('The connection is closed')
+        if len(self.queue) >= self.maxsize:
+            if self.policy == 'conflate' and key is not None \
+               and self.replace(key, text):
+                self.conflated += 1
+                return
+            if self.policy == 'disconnect' or not self.drop():
+                await self.disconnect()
+                raise RuntimeError('The connection is too slow')
+            self.dropped += 1
+        self.queue.append((key, text))
+        self.ready.set()
+
+    def replace(self, key, text):
+        for index, (queued_key, _) in enumerate(self.queue):
+            if queued_key == key:
+                del self.queue[index]
+                self.queue.append((key, text))
+                return True
+        return False
+
+    def drop(self):
+        for index, (queued_key, _) in enumerate(self.queue):
+            if queued_key is not None:
+                del self.queue[index]
+                return True
+        return False
+
+    async def disconnect(self):
+        logging.warning(
+            f'Disconnect the slow client with'
+            f' {len(self.queue)} pending messages'
+        )
+        await self.close()
+        if self.on_disconnect:
+            self.on_disconnect()
+
+    async def write(self):
+        while True:
+            await self.ready.wait()
+            while self.queue:
+                _, text = self.queue.popleft()
+                try:
+                    await self.socket.send(text)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(e, exc_info=True)
+                    self.closed = True
+                    return
+                self.sent += 1
+            if self.stopping:
+                return
+            self.ready.clear()
+
+    async def flush(self, timeout=None):
+        """
+        Send the pending messages and stop the writer, nothing is sent
+        once the socket is closed. The pending messages are discarded if
+        they are not sent in `timeout` seconds.
+        """
+        if self.closed or self.writer.cancelled():
+            return
+        self.stopping = True
+        self.ready.set()
+        if self.writer.done():
+            return
+        try:
+            await asyncio.wait_for(self.writer, timeout)
+        except asyncio.TimeoutError:
+            logging.warning(
+                f'Discard {len(self.queue)} pending messages of'
+                f' the slow client'
+            )
+            self.closed = True
+
+    async def receive(self):
+        return await self.socket.receive()
+
+    async def close(self):
+        self.closed = True
+        self.writer.cancel()
+        await self.socket.close()
+
+    def stats(self):
+        return {
+            'depth': len(self.queue),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'conflated': self.conflated
+        }
+
+
+class Connection:
+    """
+    A websocket connection, it owns the subscription tasks started for
+    it, and cancels them when it is closed. The messages are sent by the
+    socket, which may be a QueuedSocket wrapping the request socket.
+    """
+
+    def __init__(self, socket, keepalive=None, max_subscriptions=None, request=None):
+        self.socket = socket
+        self.request = socket if request is None else request
+        self.keepalive = keepalive
+        self.max_subscriptions = max_subscriptions
+        self.tasks = {}
+        self.closed = False
+        # The task serving the messages received, and whether it is
+        # stopped by disconnecting rather than the client
+        self.serving = None
+        self.disconnected = False
+        if isinstance(socket, QueuedSocket):
+            socket.on_disconnect = self.disconnect
+
+    def is_full(self):
+        return self.max_subscriptions is not None \
+            and len(self.tasks) >= self.max_subscriptions
+
+    def start(self, id, coroutine):
+        self.stop(id)
+        task = self.tasks[id] = asyncio.ensure_future(coroutine)
+
+        def done(task):
+            if self.tasks.get(id) is task:
+                del self.tasks[id]
+            if not task.cancelled():
+                # The errors are logged by the subscription already
+                task.exception()
+        task.add_done_callback(done)
+        return task
+
+    def stop(self, id):
+        task = self.tasks.pop(id, None)
+        if task:
+            task.cancel()
+
+    def disconnect(self):
+        """
+        Stop serving the connection, such as a receive is blocked while
+        the client is too slow to send to.
+        """
+        self.disconnected = True
+        if self.serving and not self.closed and not self.serving.done():
+            self.serving.cancel()
+
+    def stats(self):
+        stats = {'subscriptions': len(self.tasks)}
+        if isinstance(self.socket, QueuedSocket):
+            stats.update(self.socket.stats())
+        return stats
+
+    async def close(self):
+        """
+        Cancel all tasks and wait for them to finish.
+        """
+        self.closed = True
+        if self.keepalive:
+            self.keepalive.unregister(self.socket)
+        tasks = list(self.tasks.values())
+        self.tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class KeepAlive:
+    """
+    Send the keepalive messages to all registered sockets from a single
+    periodic task, rather than a sleeping task for each connection. The
+    sockets are sent to in batches concurrently, and the sockets failed
+    to send in `timeout` seconds, which is at most the interval, are
+    deregistered.
+    """
+
+    MESSAGE = '{"type": "ka"}'
+
+    def __init__(self, interval=20, batch_size=100, timeout=None):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.timeout = interval if timeout is None \
+            else min(timeout, interval)
+        self.sockets = {}
+        self.task = None
+        self.loop = None
+
+    def register(self, socket):
+        self.sockets[id(socket)] = socket
+        loop = asyncio.get_event_loop()
+        if self.task is None or self.task.done() or self.loop is not loop:
+            self.loop = loop
+            self.task = asyncio.ensure_future(self.run())
+
+    def unregister(self, socket):
+        self.sockets.pop(id(socket), None)
+
+    async def run(self):
+        # Stop once there is no socket, it is started again by register
+        while self.sockets:
+            await asyncio.sleep(self.interval)
+            await self.beat()
+
+    async def beat(self):
+        sockets = list(self.sockets.values())
+        for start in range(0, len(sockets), self.batch_size):
+            batch = sockets[start:start + self.batch_size]
+            results = await asyncio.gather(
+                *[
+                    asyncio.wait_for(socket.send(self.MESSAGE), self.timeout)
+                    for socket in batch
+                ],
+                return_exceptions=True
+            )
+            for socket, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.unregister(socket)
+
+
+class SubscriptionHub:
+    """
+    Share one source stream between identical subscriptions, the results
+    produced by the source are broadcast to all current subscribers. The
+    subscribers are reference counted, the source is cancelled once the
+    last subscriber stops. Each subscriber buffers at most `queue_size`
+    results, the oldest one is dropped once its buffer is full, so a slow
+    subscriber does not hold the results without limit.
+    """
+
+    def __init__(self, queue_size=64):
+        self.queue_size = queue_size
+        self.streams = {}
+        self.dropped = 0
+
+    def subscribe(self, key, start):
+        """
+        Return an asynchronous iterator of the results of stream with the
+        key, `start` is called to create the source if it is not running.
+        """
+        stream = self.streams.get(key)
+        if stream is None:
+            stream = self.streams[key] = Stream(self, key)
+            stream.start(start())
+        return stream.subscribe()
+
+    def stats(self):
+        return {
+            'streams': len(self.streams),
+            'subscribers': sum(
+                len(stream.subscribers) for stream in self.streams.values()
+            ),
+            'dropped': self.dropped
+        }
+
+
+class Stream:
+
+    def __init__(self, hub, key):
+        self.hub = hub
+        self.key = key
+        self.subscribers = set()
+        self.task = None
+
+    def start(self, source):
+        self.task = asyncio.ensure_future(self.run(source))
+
+    async def run(self, source):
+        try:
+            async for result in source:
+                for queue in list(self.subscribers):
+                    self.publish(queue, result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(e, exc_info=True)
+        finally:
+            self.detach()
+            for queue in list(self.subscribers):
+                self.publish(queue, _END)
+
+    def publish(self, queue, result):
+        if queue.full():
+            queue.get_nowait()
+            self.hub.dropped += 1
+        queue.put_nowait(result)
+
+    def subscribe(self):
+        # Register the queue before the iteration starts, so the results
+        # produced in between are not missed
+        queue = asyncio.Queue(self.hub.queue_size)
+        self.subscribers.add(queue)
+        return self.receive(queue)
+
+    async def receive(self, queue):
+        try:
+            while True:
+                result = await queue.get()
+                if result is _END:
+                    return
+                yield result
+        finally:
+            self.subscribers.discard(queue)
+            if not self.subscribers:
+                self.close()
+
+    def close(self):
+        self.detach()
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def detach(self):
+        # A new stream may have been started with the same key
+        if self.hub.streams.get(self.key) is self:
+            del self.hub.streams[self.key]
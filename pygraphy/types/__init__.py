@@ -5,6 +5,7 @@ from .interface import Interface, InterfaceType
 from .object import DefaultObject as Object, ObjectType
 from .schema import Schema, SchemaType, context, Socket, SubscribableSchema
 from .field import field, metafield, Field, ResolverField
+from .selection import SelectionInfo, SelectedField
 
 
 __all__ = [
@@ -25,5 +26,7 @@ __all__ = [
     'ResolverField',
     'context',
     'Socket',
-    'SubscribableSchema'
+    'SubscribableSchema',
+    'SelectionInfo',
+    'SelectedField'
 ]
@@ -1,3 +1,4 @@
+from typing import Mapping
 from graphql.language.ast import (
     IntValueNode,
     FloatValueNode,
@@ -36,6 +37,7 @@ VALID_BASIC_TYPES = {
     float: 'Float',
     bool: 'Boolean',
 }
+SCALAR_TYPES = {name: ptype for ptype, name in VALID_BASIC_TYPES.items()}
 
 
 def print_type(gtype, nonnull=True, except_types=()):
@@ -84,19 +86,20 @@ def load_literal_value(node, ptype):
         return node.value
     elif isinstance(node, NullValueNode):
         return None
+    elif isinstance(node, (ListValueNode, EnumValueNode, ObjectValueNode)) \
+            and is_optional(ptype):
+        return load_literal_value(node, ptype.__args__[0])
     elif isinstance(node, ListValueNode):
         return [load_literal_value(v, ptype.__args__[0]) for v in node.values]
     elif isinstance(node, EnumValueNode):
-        value = getattr(ptype, node.value)
+        value = getattr(ptype, node.value, None)
         if not value:
             raise RuntimeError(
-                f'{node.value} is not a valid member of {type}',
+                f'{node.value} is not a valid member of {ptype}',
                 node
             )
         return value
     elif isinstance(node, ObjectValueNode):
-        if is_optional(ptype):
-            return load_literal_value(node, ptype.__args__[0])
         data = {}
         keys = ptype.__dataclass_fields__.keys()
         for field in node.fields:
@@ -108,29 +111,138 @@ def load_literal_value(node, ptype):
         return ptype(**data)
     elif isinstance(node, VariableNode):
         name = node.name.value
-        variables = types.context.get().variables
-        if name not in variables:
-            raise RuntimeError(f'Can not find variable {name}')
+        context = types.context.get()
+        if name in context.variable_values:
+            return context.variable_values[name]
+        variables = context.variables
+        if not variables or name not in variables:
+            raise RuntimeError(f'Can not find variable {name}', node)
         variable = variables[name]
         return load_variable(variable, ptype)
     raise RuntimeError(f'Can not convert {node.value}', node)
 
 
 def load_variable(variable, ptype):
+    return get_coercer(ptype)(variable)
+
+
+COERCERS = {}
+
+
+def get_coercer(ptype):
+    """
+    Return the function which converts a variable value to the Python type,
+    it is compiled once for each type.
+    """
+    coercer = COERCERS.get(ptype)
+    if coercer is None:
+        coercer = COERCERS[ptype] = compile_coercer(ptype)
+    return coercer
+
+
+def compile_coercer(ptype):
     if isinstance(ptype, types.InputType):
-        data = {}
-        keys = ptype.__dataclass_fields__.keys()
-        for key, value in variable.items():
-            snake_cases = to_snake_case(key)
-            data[snake_cases if key not in keys else key] = load_variable(value, ptype.__fields__[snake_cases].ftype)
-        return ptype(**data)
+        # The fields are compiled when they are used at the first time,
+        # so that the recursive input types are supported.
+        fields = {}
+
+        def coerce_input(variable):
+            data = {}
+            for key, value in variable.items():
+                target = fields.get(key)
+                if target is None:
+                    target = fields[key] = compile_input_field(ptype, key)
+                name, coerce = target
+                data[name] = coerce(value)
+            return ptype(**data)
+        return coerce_input
     elif is_list(ptype):
-        return [load_variable(i, ptype.__args__[0]) for i in variable]
+        coerce_item = get_coercer(ptype.__args__[0])
+
+        def coerce_list(variable):
+            return [coerce_item(i) for i in variable]
+        return coerce_list
     elif is_optional(ptype):
-        if variable is None:
-            return None
-        return load_variable(variable, ptype.__args__[0])
+        coerce_value = get_coercer(ptype.__args__[0])
+
+        def coerce_optional(variable):
+            if variable is None:
+                return None
+            return coerce_value(variable)
+        return coerce_optional
     elif isinstance(ptype, types.EnumType):
-        return getattr(ptype, variable)
+        def coerce_enum(variable):
+            return getattr(ptype, variable)
+        return coerce_enum
     else:
-        return variable
+        def coerce_scalar(variable):
+            return variable
+        return coerce_scalar
+
+
+def compile_input_field(ptype, key):
+    keys = ptype.__dataclass_fields__.keys()
+    snake_cases = to_snake_case(key)
+    return (
+        key if key in keys else snake_cases,
+        get_coercer(ptype.__fields__[snake_cases].ftype)
+    )
+
+
+VALIDATORS = {}
+
+
+def get_validator(ptype):
+    """
+    Return the function which checks whether a resolved value matches the
+    return type, it is compiled once for each type.
+    """
+    validator = VALIDATORS.get(ptype)
+    if validator is None:
+        validator = VALIDATORS[ptype] = compile_validator(ptype)
+    return validator
+
+
+def compile_validator(ptype):
+    if is_optional(ptype):
+        validate_value = get_validator(ptype.__args__[0])
+
+        def validate_optional(result):
+            return result is None or validate_value(result)
+        return validate_optional
+    elif is_list(ptype):
+        validate_item = get_validator(ptype.__args__[0])
+
+        def validate_list(result):
+            if not isinstance(result, list):
+                return False
+            for item in result:
+                if not validate_item(item):
+                    return False
+            return True
+        return validate_list
+    elif isinstance(ptype, types.UnionType):
+        # Most of results are exactly one of members, which are looked up
+        # directly, the subclasses and sources fall back to the validators.
+        dispatch = set(ptype.members)
+        validators = [get_validator(member) for member in ptype.members]
+
+        def validate_union(result):
+            if type(result) in dispatch:
+                return True
+            return any(validate(result) for validate in validators)
+        return validate_union
+
+    source = getattr(ptype, '__source__', None)
+    if source == 'mapping':
+        def validate_mapping(result):
+            return isinstance(result, (ptype, Mapping))
+        return validate_mapping
+    elif source == 'attribute':
+        def validate_attribute(result):
+            return result is not None
+        return validate_attribute
+
+    def validate_instance(result):
+        return isinstance(result, ptype)
+    return validate_instance
@@ -0,0 +1,443 @@
+import asyncio
+import logging
+from inspect import isawaitable
+from pygraphy.utils import is_list, is_optional
+from pygraphy.exceptions import RuntimeError
+from pygraphy import types
+from .object import Object
+from .base import load_literal_value
+
+
+class Executor:
+    """
+    Walk the execution plan of an operation, and write the results into
+    the response mapping directly while resolving. Everything is resolved
+    inline until a resolver returns an awaitable, the methods return an
+    awaitable only if there are pending asynchronous resolvers.
+    """
+
+    def __init__(self, error_collector, concurrent=False, semaphore=None, validate=True):
+        self.error_collector = error_collector
+        self.concurrent = concurrent
+        self.semaphore = semaphore
+        self.validate = validate
+        # The ids of reported errors, the error of a batch resolver is
+        # shared by all parent objects and reported once
+        self.reported = set()
+
+    def resolve(self, obj, selection, output, path=[], batched=None, ptype=None):
+        """
+        Resolve the selection on the object into output. Return False if
+        a non-null field failed, otherwise return True, or an awaitable of
+        them if there are asynchronous resolvers. The type must be given if
+        the object is a source of an object type.
+        """
+        return self.resolve_plans(
+            obj,
+            selection.fields(ptype or type(obj), path),
+            output,
+            path,
+            batched
+        )
+
+    async def resolve_serially(self, obj, selection, output, path=[]):
+        """
+        Resolve fields one after another, each field and its sub-selection
+        must be completed before the next one starts, such as the top-level
+        fields of mutation.
+        """
+        returned = True
+        for plan in selection.fields(type(obj), path):
+            result = self.resolve_plans(obj, [plan], output, path)
+            if isawaitable(result):
+                result = await result
+            if result is False:
+                returned = False
+        return returned
+
+    def resolve_plans(self, obj, plans, output, path, batched=None):
+        pending = self.start_tasks(obj, plans, output, path, batched)
+        if pending:
+            return self.receive_and_complete(plans, pending, output, path)
+        return self.complete_fields(plans, output, path)
+
+    async def subscribe(self, obj, selection, path=[]):
+        """
+        Resolve a subscription, yield a pair of the completed flag and the
+        response every time the source stream produces a result.
+        """
+        plans = selection.fields(type(obj), path)
+        sources = {}
+        pending = self.start_tasks(obj, plans, sources, path)
+        await self.receive(pending, sources, path)
+
+        generators = []
+        for plan in plans:
+            if hasattr(sources[plan.key], '__aiter__'):
+                generators.append((plan, sources[plan.key]))
+
+        if not generators:
+            returned = self.complete_fields(plans, sources, path)
+            if isawaitable(returned):
+                returned = await returned
+            yield returned, sources
+            return
+
+        for plan, generator in generators:
+            try:
+                async for result in generator:
+                    output = dict(sources)
+                    output[plan.key] = result
+                    returned = self.complete_fields(plans, output, path)
+                    if isawaitable(returned):
+                        returned = await returned
+                    yield returned, output
+            finally:
+                aclose = getattr(generator, 'aclose', None)
+                if aclose:
+                    await aclose()
+
+    def start_tasks(self, obj, plans, output, path, batched=None):
+        """
+        Read the plain fields and call the resolvers, the synchronous
+        results are written into output directly, and the awaitable
+        results are scheduled and returned as pending tasks.
+        """
+        pending = []
+        for plan in plans:
+            if not plan.resolver:
+                try:
+                    output[plan.key] = plan.read(obj)
+                except Exception as e:
+                    self.handle_error(e, plan.node, path + [plan.key])
+                    output[plan.key] = None
+                continue
+
+            try:
+                if batched and plan.key in batched:
+                    returned = batched[plan.key]
+                    if isinstance(returned, Exception):
+                        raise returned
+                elif plan.batch:
+                    returned = pick(
+                        getattr(plan.parent_type, plan.resolver)(
+                            [obj], **package_args(plan)
+                        ),
+                        0,
+                        1
+                    )
+                elif plan.source:
+                    # The source is passed as self of the resolver
+                    returned = getattr(plan.parent_type, plan.resolver)(
+                        obj, **package_args(plan)
+                    )
+                else:
+                    returned = getattr(obj, plan.resolver)(
+                        **package_args(plan)
+                    )
+            except Exception as e:
+                self.handle_error(e, plan.node, path + [plan.key])
+                output[plan.key] = None
+                continue
+
+            if isawaitable(returned):
+                if self.semaphore:
+                    returned = self.limit(returned)
+                # Keep the place of field in output
+                output[plan.key] = None
+                pending.append((plan, asyncio.ensure_future(returned)))
+            else:
+                output[plan.key] = returned
+        return pending
+
+    async def limit(self, awaitable):
+        async with self.semaphore:
+            return await awaitable
+
+    async def receive(self, pending, output, path):
+        for plan, task in pending:
+            try:
+                output[plan.key] = await task
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.handle_error(e, plan.node, path + [plan.key])
+
+    async def receive_and_complete(self, plans, pending, output, path):
+        await self.receive(pending, output, path)
+        returned = self.complete_fields(plans, output, path)
+        if isawaitable(returned):
+            returned = await returned
+        return returned
+
+    def complete_fields(self, plans, output, path):
+        """
+        Check the resolved values, and replace the objects in output with
+        the response of their sub-selections. A value whose sub-selection
+        failed is nulled, and the failure of a non-null field is returned
+        as False, so the parent is nulled in turn.
+        """
+        awaitables = []
+        returned, error = True, None
+        for plan in plans:
+            result = output[plan.key]
+            if self.validate:
+                valid = plan.validate(result)
+            else:
+                # Trust the resolvers, but null is still checked since it
+                # is propagated to the parent
+                valid = result is not None or plan.nullable
+            if not valid:
+                if result is None and self.error_collector:
+                    returned = False
+                else:
+                    error = RuntimeError(
+                        f'{result} is not a valid return value to'
+                        f' {plan.name}, please check {plan.name}\'s type annotation',
+                        plan.node,
+                        path + [plan.key]
+                    )
+                # The fields completing already are still awaited
+                break
+            if plan.selection is not None and result is not None:
+                completed = self.complete_value(
+                    result, plan, output, path + [plan.key]
+                )
+                if isawaitable(completed):
+                    awaitables.append((plan, completed))
+                elif not completed and not plan.nullable:
+                    returned = False
+                    break
+        if awaitables:
+            return self.complete_later(awaitables, returned, error)
+        if error:
+            raise error
+        return returned
+
+    async def complete_later(self, awaitables, returned, error):
+        results = await self.gather([completed for _, completed in awaitables])
+        if error:
+            raise error
+        for (plan, _), completed in zip(awaitables, results):
+            if not completed and not plan.nullable:
+                returned = False
+        return returned
+
+    def complete_value(self, result, plan, output, path):
+        """
+        Resolve the sub-selection of result, return whether it succeeded,
+        or an awaitable of it if there are asynchronous resolvers. The value
+        in output is nulled if it failed.
+        """
+        source_type = plan.source_type
+        if isinstance(result, Object) \
+           or (source_type and not is_list_type(plan.field.ftype)):
+            child = output[plan.key] = {}
+            returned = self.resolve(
+                result,
+                plan.selection,
+                child,
+                path,
+                ptype=type(result) if isinstance(result, Object)
+                else source_type
+            )
+            return null_failed(returned, output, plan.key)
+        elif hasattr(result, '__iter__'):
+            items, item_types, children, values, positions = [], [], [], [], []
+            for item in result:
+                if isinstance(item, Object):
+                    item_type = type(item)
+                elif source_type and item is not None:
+                    item_type = source_type
+                else:
+                    values.append(item)
+                    continue
+                child = {}
+                items.append(item)
+                item_types.append(item_type)
+                children.append(child)
+                positions.append(len(values))
+                values.append(child)
+            output[plan.key] = values
+
+            batched = self.start_batches(
+                items, item_types, plan.selection, path
+            )
+            # The resolvers of all items are started before receiving any
+            # of them, so the loads of a whole level go out in one batch,
+            # while the items are still completed one after another unless
+            # the resolution is concurrent.
+            results, awaitables = [], []
+            for item, item_type, child, item_batched, position in zip(
+                items, item_types, children, batched, positions
+            ):
+                returned = null_failed(
+                    self.resolve(
+                        item,
+                        plan.selection,
+                        child,
+                        path,
+                        batched=item_batched,
+                        ptype=item_type
+                    ),
+                    values,
+                    position
+                )
+                if isawaitable(returned):
+                    awaitables.append(returned)
+                else:
+                    results.append(returned)
+            # A failed item is nulled, and so is the list if the items are
+            # non-null
+            nullable = is_nullable_item(plan.field.ftype)
+            if awaitables:
+                return null_failed(
+                    self.complete_items(awaitables, results, nullable),
+                    output,
+                    plan.key
+                )
+            return null_failed(
+                nullable or all(results), output, plan.key
+            )
+        return True
+
+    async def complete_items(self, awaitables, results, nullable):
+        results += await self.gather(awaitables)
+        return nullable or all(results)
+
+    def start_batches(self, items, item_types, selection, path):
+        """
+        Call the batch resolvers once for all items of a list, and return
+        the result of each item, which are picked up by `resolve` later.
+        """
+        batched = [{} for _ in items]
+        groups = {}
+        for index, item_type in enumerate(item_types):
+            groups.setdefault(item_type, []).append(index)
+
+        for ptype, indexes in groups.items():
+            for plan in selection.fields(ptype, path):
+                if not plan.batch:
+                    continue
+                try:
+                    returned = getattr(ptype, plan.resolver)(
+                        [items[index] for index in indexes],
+                        **package_args(plan)
+                    )
+                    # The length is checked once for all parent objects,
+                    # so a wrong result is reported as one error
+                    if isawaitable(returned):
+                        returned = asyncio.ensure_future(
+                            check_later(returned, len(indexes))
+                        )
+                    else:
+                        check_length(returned, len(indexes))
+                    for position, index in enumerate(indexes):
+                        batched[index][plan.key] = pick(
+                            returned, position, len(indexes)
+                        )
+                except Exception as e:
+                    for index in indexes:
+                        batched[index][plan.key] = e
+        return batched
+
+    async def gather(self, awaitables):
+        """
+        Await all of the awaitables and return their results, the first
+        exception is raised only after all of them are done, so nothing is
+        left running in background.
+        """
+        if len(awaitables) > 1 and self.concurrent:
+            results = await asyncio.gather(
+                *awaitables, return_exceptions=True
+            )
+        else:
+            results = []
+            for awaitable in awaitables:
+                try:
+                    results.append(await awaitable)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    results.append(e)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def handle_error(self, e, node, path):
+        if id(e) in self.reported:
+            return
+        self.reported.add(id(e))
+        logging.error(e, exc_info=True)
+        e.location = node.loc.source.get_location(node.loc.start)
+        e.path = path
+        self.error_collector.append(e)
+
+
+def pick(returned, index, length):
+    async def pick_later():
+        results = await returned
+        check_length(results, length)
+        return results[index]
+
+    if isawaitable(returned):
+        return pick_later()
+    check_length(returned, length)
+    return returned[index]
+
+
+def check_length(results, length):
+    if not isinstance(results, list) or len(results) != length:
+        raise ValueError(
+            'The batch resolver must return a list'
+            ' with the same length of parent objects'
+        )
+
+
+async def check_later(returned, length):
+    results = await returned
+    check_length(results, length)
+    return results
+
+
+def package_args(plan):
+    if not plan.variable_arguments:
+        return plan.arguments
+    # The arguments depending on variables are evaluated once per request,
+    # rather than once for each object.
+    values = types.context.get().argument_values
+    kwargs = values.get(id(plan))
+    if kwargs is None:
+        kwargs = dict(plan.arguments)
+        for name, (value, slot) in plan.variable_arguments.items():
+            kwargs[name] = load_literal_value(value, slot)
+        values[id(plan)] = kwargs
+    return kwargs
+
+
+def is_list_type(ftype):
+    if is_optional(ftype):
+        ftype = ftype.__args__[0]
+    return is_list(ftype)
+
+
+def is_nullable_item(ftype):
+    if is_optional(ftype):
+        ftype = ftype.__args__[0]
+    return is_optional(ftype.__args__[0])
+
+
+def null_failed(returned, output, key):
+    """
+    Null the value in output if its completion failed.
+    """
+    if isawaitable(returned):
+        return null_failed_later(returned, output, key)
+    if not returned:
+        output[key] = None
+    return returned
+
+
+async def null_failed_later(returned, output, key):
+    return null_failed(await returned, output, key)
@@ -36,12 +36,19 @@ def metafield(method):
     return method
 
 
-def field(method):
+def field(method=None, *, batch=False):
     """
-    Mark class method as a resolver
+    Mark class method as a resolver, a batch resolver is called once with
+    the list of parent objects, and returns the results in the same order
     """
-    method.__is_field__ = True
-    return method
+    def mark(method):
+        method.__is_field__ = True
+        method.__is_batch__ = batch
+        return method
+
+    if method is None:
+        return mark
+    return mark(method)
 
 
 @dataclasses.dataclass
@@ -51,6 +58,9 @@ class Field:
     _ftype: type
     description: Optional[str]
 
+    # Set once the schema is built, the resolved types are used since then
+    _finalized = False
+
     def __str__(self):
         literal = f'{to_camel_case(self.name)}: {print_type(self.ftype)}'
         if self.description:
@@ -59,8 +69,18 @@ class Field:
 
     @property
     def ftype(self):
+        if self._finalized:
+            return self._resolved_ftype
         return self.replace_forwarded_type(self._ftype)
 
+    def finalize(self):
+        """
+        Resolve the forward references once, so they are not evaluated
+        again during execution.
+        """
+        self._resolved_ftype = self.replace_forwarded_type(self._ftype)
+        self._finalized = True
+
     def replace_forwarded_type(self, ptype):
         if hasattr(ptype, '__args__'):
             args = [self.replace_forwarded_type(t) for t in ptype.__args__]
@@ -92,14 +112,22 @@ class Field:
 @dataclasses.dataclass
 class ResolverField(Field):
     _params: Mapping[str, inspect.Parameter]
+    # The parameter receives the SelectionInfo rather than an argument
+    selection_param: Optional[str] = None
 
     @property
     def params(self):
+        if self._finalized:
+            return self._resolved_params
         param_dict = {}
         for name, param in self._params.items():
             param_dict[name] = self.replace_forwarded_type(param.annotation)
         return param_dict
 
+    def finalize(self):
+        self._resolved_params = self.params
+        super().finalize()
+
     def __str__(self):
         if not self.params:
             literal = f'{to_camel_case(self.name)}: {print_type(self.ftype)}'
@@ -113,12 +141,12 @@ class ResolverField(Field):
         return literal
 
     def print_args(self):
-        literal = ''
-        for name, param in self.params.items():
-            literal += f'{to_camel_case(name)}:' \
-                       f' {print_type(param)}' \
-                       f'{self.print_default_value(name)}\n'  # noqa
-        return literal[:-1]
+        return '\n'.join(
+            f'{to_camel_case(name)}:'
+            f' {print_type(param)}'
+            f'{self.print_default_value(name)}'
+            for name, param in self.params.items()
+        )
 
     def print_default_value(self, name):
         default = self._params[name].default
@@ -131,7 +159,17 @@ class FieldableType(GraphQLType):
         attrs['__fields__'] = {}
         attrs['__description__'] = None
         attrs['__validated__'] = False
-        cls = dataclasses.dataclass(super().__new__(cls, name, bases, attrs))
+        if attrs.get('__compact__', any(
+            getattr(base, '__compact__', False) for base in bases
+        )):
+            defaults = declare_slots(attrs, bases)
+            cls = make_slotted_dataclass(
+                super().__new__(cls, name, bases, attrs), defaults
+            )
+        else:
+            cls = dataclasses.dataclass(
+                super().__new__(cls, name, bases, attrs)
+            )
         sign = inspect.signature(cls)
         cls.__description__ = inspect.getdoc(cls)
         for name, t in sign.parameters.items():
@@ -141,9 +179,67 @@ class FieldableType(GraphQLType):
         return cls
 
     def print_field(cls, indent=0):
-        literal = ''
-        for _, field in cls.__fields__.items():
-            if field.name.startswith('__'):
-                continue
-            literal += f'{field}\n'
-        return patch_indents(literal[:-1], indent)
+        literal = '\n'.join(
+            str(field) for field in cls.__fields__.values()
+            if not field.name.startswith('__')
+        )
+        return patch_indents(literal, indent)
+
+
+def get_slots(cls):
+    return normalize_slots(cls.__dict__.get('__slots__', ()))
+
+
+def normalize_slots(slots):
+    return (slots,) if isinstance(slots, str) else tuple(slots)
+
+
+def declare_slots(attrs, bases):
+    """
+    Declare the dataclass fields in __slots__ of class body, so that the
+    class is created with slots at once, rather than recreated, which
+    would leave the first class in the subclasses of its bases. Other
+    instance attributes can be declared in the __slots__ of class body.
+    The default values are taken out of the body and returned, since they
+    conflict with the slots.
+    """
+    slotted = set()
+    names = []
+    for base in bases:
+        for klass in base.__mro__:
+            slotted.update(get_slots(klass))
+        if dataclasses.is_dataclass(base):
+            names.extend(f.name for f in dataclasses.fields(base))
+    names.extend(
+        name for name, annotation in attrs.get('__annotations__', {}).items()
+        if not is_classvar(annotation)
+    )
+    declared = normalize_slots(attrs.get('__slots__', ()))
+    names = tuple(dict.fromkeys(
+        name for name in names
+        if name not in slotted and name not in declared
+    )) + declared
+    defaults = {
+        name: attrs.pop(name) for name in names if name in attrs
+    }
+    attrs['__slots__'] = names
+    return defaults
+
+
+def make_slotted_dataclass(cls, defaults):
+    # The dataclass reads the defaults from class attributes, and then
+    # sets or deletes them, so the slot descriptors are restored after it
+    descriptors = {name: cls.__dict__[name] for name in defaults}
+    for name, default in defaults.items():
+        setattr(cls, name, default)
+    cls = dataclasses.dataclass(cls)
+    for name, descriptor in descriptors.items():
+        setattr(cls, name, descriptor)
+    return cls
+
+
+def is_classvar(annotation):
+    if isinstance(annotation, str):
+        return annotation.startswith(('ClassVar', 'typing.ClassVar'))
+    return annotation is typing.ClassVar \
+        or getattr(annotation, '__origin__', None) is typing.ClassVar
@@ -37,11 +37,9 @@ class InputType(FieldableType):
         )
 
     def print_field(cls, indent=0):
-        literal = ''
-        for _, field in cls.__fields__.items():
-            literal += f'{field}\n'
-        return patch_indents(literal[:-1], indent)
+        literal = '\n'.join(str(field) for field in cls.__fields__.values())
+        return patch_indents(literal, indent)
 
 
 class Input(metaclass=InputType):
-    pass
+    __slots__ = ()
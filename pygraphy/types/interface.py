@@ -4,6 +4,7 @@ from pygraphy.utils import (
     patch_indents
 )
 from .field import ResolverField, FieldableType
+from .selection import is_selection_param
 
 
 class InterfaceType(FieldableType):
@@ -20,12 +21,19 @@ class InterfaceType(FieldableType):
 
             if field_name:
                 sign = inspect.signature(attr)
+                params = cls.remove_self(sign.parameters)
+                selection_param = None
+                for param_name, param in list(params.items()):
+                    if is_selection_param(param):
+                        selection_param = param_name
+                        del params[param_name]
                 cls.__fields__[field_name] = ResolverField(
                     name=field_name,
                     _ftype=sign.return_annotation,
-                    _params=cls.remove_self(sign.parameters),
+                    _params=params,
                     description=inspect.getdoc(attr),
-                    _obj=cls
+                    _obj=cls,
+                    selection_param=selection_param
                 )
         return cls
 
@@ -51,4 +59,4 @@ class InterfaceType(FieldableType):
 
 
 class Interface(metaclass=InterfaceType):
-    pass
+    __slots__ = ()
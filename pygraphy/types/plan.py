@@ -0,0 +1,452 @@
+import dataclasses
+from operator import attrgetter
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from graphql.language import print_ast
+from graphql.language.ast import (
+    FieldNode,
+    FragmentSpreadNode,
+    FragmentDefinitionNode,
+    InlineFragmentNode,
+    ListTypeNode,
+    ListValueNode,
+    ObjectValueNode,
+    VariableNode,
+    NonNullTypeNode,
+    OperationType
+)
+from pygraphy.utils import to_snake_case, shelling_type, is_optional
+from pygraphy.exceptions import RuntimeError
+from .field import Field, ResolverField
+from .base import get_coercer, get_validator, load_literal_value
+from .selection import SelectionInfo
+from .interface import InterfaceType
+from .union import UnionType
+
+
+class Document:
+    """
+    A parsed query document, it caches the execution plan of each operation
+    so that repeated requests do not need to interpret the AST again.
+    """
+
+    def __init__(self, ast):
+        self.ast = ast
+        self.plans = {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in ast.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+
+    @property
+    def normalized(self):
+        """
+        The printed document, which is the same for the queries only
+        differing in formatting.
+        """
+        normalized = self.__dict__.get('_normalized')
+        if normalized is None:
+            normalized = self._normalized = print_ast(self.ast)
+        return normalized
+
+    def plan(self, schema, definition):
+        key = (schema, id(definition))
+        plan = self.plans.get(key)
+        if plan is None:
+            plan = self.plans[key] = OperationPlan(self, schema, definition)
+        return plan
+
+
+INTROSPECTION_FIELDS = {'__schema', '__type', '__typename'}
+
+
+class OperationPlan:
+
+    def __init__(self, document, schema, definition):
+        self.definition = definition
+        self.root_type = schema.__fields__[
+            schema.OPERATION_MAP[definition.operation]
+        ].ftype.__args__[0]
+        self.selection = SelectionPlan(
+            document, schema, [definition.selection_set]
+        )
+        self.variables = [
+            plan_variable(schema, node)
+            for node in definition.variable_definitions
+        ]
+        # An introspection query without variables always has the same
+        # result, its serialized response is cached after the first run.
+        self.static = definition.operation == OperationType.QUERY \
+            and not definition.variable_definitions \
+            and all(
+                isinstance(node, FieldNode)
+                and node.name.value in INTROSPECTION_FIELDS
+                for node in definition.selection_set.selections
+            )
+        self.serialized = None
+
+    def coerce_variables(self, variables):
+        """
+        Convert the variables of a request with the compiled coercers, and
+        fill in the default values of absent variables.
+        """
+        variables = variables or {}
+        values = {}
+        for variable in self.variables:
+            if variable.name in variables:
+                if variable.coercer:
+                    values[variable.name] = variable.coercer(
+                        variables[variable.name]
+                    )
+            elif variable.has_default:
+                values[variable.name] = variable.default
+        return values
+
+
+@dataclasses.dataclass
+class VariablePlan:
+    name: str
+    ptype: Optional[type]
+    coercer: Optional[Callable[[Any], Any]]
+    has_default: bool
+    default: Any
+
+
+@dataclasses.dataclass
+class FieldPlan:
+    key: str
+    name: str
+    field: Field
+    parent_type: type
+    # The source kind of parent type, see Object.__source__
+    source: Optional[str]
+    attribute: Optional[str]
+    # Read the value of a plain field from the parent object
+    read: Optional[Callable[[Any], Any]]
+    resolver: Optional[str]
+    batch: bool
+    # The arguments without variables are evaluated once when planning,
+    # and the others are evaluated once per request.
+    arguments: Dict[str, Any]
+    variable_arguments: Dict[str, Tuple[Any, type]]
+    node: FieldNode
+    selection: Optional['SelectionPlan']
+    # The object type of field if it is backed by a source
+    source_type: Optional[type]
+    validate: Callable[[Any], bool]
+    nullable: bool
+
+
+class SelectionPlan:
+    """
+    The planned sub-selection of a field, the field plans are built once
+    for each concrete type the selection is resolved on.
+    """
+
+    def __init__(self, document, schema, selection_sets):
+        self.document = document
+        self.schema = schema
+        self.selection_sets = selection_sets
+        self.by_type = {}
+
+    def fields(self, ptype, path=[]) -> List[FieldPlan]:
+        plans = self.by_type.get(ptype)
+        if plans is None:
+            grouped_fields = {}
+            visited_fragments = set()
+            for selection_set in self.selection_sets:
+                self.collect_fields(
+                    ptype,
+                    selection_set.selections,
+                    grouped_fields,
+                    visited_fragments,
+                    path
+                )
+            plans = [
+                self.plan_field(ptype, nodes, path)
+                for nodes in grouped_fields.values()
+            ]
+            self.by_type[ptype] = plans
+        return plans
+
+    def collect_fields(self, ptype, selections, grouped_fields, visited_fragments, path):
+        """
+        Group the selected field nodes by response key, and flatten the
+        fragments which apply to the type, see CollectFields in spec.
+        """
+        for node in selections:
+            if isinstance(node, InlineFragmentNode):
+                if does_fragment_type_apply(
+                    self.schema, ptype, node.type_condition
+                ):
+                    self.collect_fields(
+                        ptype,
+                        node.selection_set.selections,
+                        grouped_fields,
+                        visited_fragments,
+                        path
+                    )
+            elif isinstance(node, FragmentSpreadNode):
+                name = node.name.value
+                if name in visited_fragments:
+                    continue
+                visited_fragments.add(name)
+                fragment = self.document.fragments.get(name)
+                if not fragment:
+                    raise RuntimeError(
+                        f'Unknown fragment "{name}"', node, path
+                    )
+                if does_fragment_type_apply(
+                    self.schema, ptype, fragment.type_condition
+                ):
+                    self.collect_fields(
+                        ptype,
+                        fragment.selection_set.selections,
+                        grouped_fields,
+                        visited_fragments,
+                        path
+                    )
+            else:
+                key = node.alias.value if node.alias else node.name.value
+                grouped_fields.setdefault(key, []).append(node)
+
+    def plan_field(self, ptype, nodes, path):
+        node = nodes[0]
+        name = node.name.value
+        key = node.alias.value if node.alias else name
+        check_mergeable(nodes, path + [key])
+        snake_cases = to_snake_case(name)
+        field = ptype.__fields__.get(snake_cases)
+        if not field:
+            raise RuntimeError(
+                f"Cannot query field '{name}' on type '{ptype}'.",
+                node,
+                path + [key]
+            )
+
+        source = getattr(ptype, '__source__', None)
+        attribute, read, resolver = None, None, None
+        if isinstance(field, ResolverField):
+            resolver = get_resolver_name(ptype, snake_cases)
+            if not resolver:
+                raise RuntimeError(
+                    f"Cannot query field '{name}' on type '{ptype}'.",
+                    node,
+                    path + [key]
+                )
+            if source and resolver == '_typename':
+                # The source object does not know its GraphQL type
+                resolver, read = None, constant(ptype.__name__)
+        else:
+            keys = ptype.__dataclass_fields__.keys()
+            attribute = name if name in keys else snake_cases
+            if source == 'mapping':
+                read = read_item(attribute, is_optional(field.ftype))
+            elif source == 'attribute':
+                read = read_attribute(attribute, is_optional(field.ftype))
+            else:
+                read = attrgetter(attribute)
+
+        selection = None
+        selection_sets = [n.selection_set for n in nodes if n.selection_set]
+        if selection_sets:
+            selection = SelectionPlan(
+                self.document, self.schema, selection_sets
+            )
+        elif is_composite(field.ftype):
+            raise RuntimeError(
+                f"Field '{name}' of type '{ptype}' must have"
+                f" a selection of subfields.",
+                node,
+                path + [key]
+            )
+
+        arguments, variable_arguments = plan_arguments(
+            node, field, path + [key]
+        )
+        if isinstance(field, ResolverField) and field.selection_param:
+            arguments[field.selection_param] = SelectionInfo(
+                shelling_type(field.ftype), selection
+            )
+        shelled = shelling_type(field.ftype)
+        return FieldPlan(
+            key=key,
+            name=name,
+            field=field,
+            parent_type=ptype,
+            source=source,
+            attribute=attribute,
+            read=read,
+            resolver=resolver,
+            batch=getattr(getattr(ptype, resolver, None), '__is_batch__', False)
+            if resolver else False,
+            arguments=arguments,
+            variable_arguments=variable_arguments,
+            node=node,
+            selection=selection,
+            source_type=shelled
+            if getattr(shelled, '__source__', None) else None,
+            validate=get_validator(field.ftype),
+            nullable=is_optional(field.ftype)
+        )
+
+
+def plan_variable(schema, node):
+    name = node.variable.name.value
+    ptype = get_variable_type(schema, node.type)
+    has_default = node.default_value is not None
+    default = None
+    if has_default:
+        if ptype is None:
+            raise RuntimeError(
+                f'Unknown type of variable "{name}"', node
+            )
+        # Default values are constant, they never contain variables
+        default = load_literal_value(node.default_value, ptype)
+    return VariablePlan(
+        name=name,
+        ptype=ptype,
+        coercer=get_coercer(ptype) if ptype is not None else None,
+        has_default=has_default,
+        default=default
+    )
+
+
+def get_variable_type(schema, node, nullable=True):
+    """
+    Return the Python type of a variable type node, or None if the type
+    is not registered in schema.
+    """
+    if isinstance(node, NonNullTypeNode):
+        return get_variable_type(schema, node.type, nullable=False)
+    elif isinstance(node, ListTypeNode):
+        ptype = get_variable_type(schema, node.type)
+        ptype = List[ptype] if ptype is not None else None
+    else:
+        ptype = schema.get_type(node.name.value)
+    if ptype is not None and nullable:
+        return Optional[ptype]
+    return ptype
+
+
+def check_mergeable(nodes, path):
+    if len(nodes) == 1:
+        return
+    node = nodes[0]
+    arguments = print_arguments(node)
+    for other in nodes[1:]:
+        if other.name.value != node.name.value:
+            raise RuntimeError(
+                f'Fields "{path[-1]}" conflict because {node.name.value}'
+                f' and {other.name.value} are different fields',
+                other,
+                path
+            )
+        if print_arguments(other) != arguments:
+            raise RuntimeError(
+                f'Fields "{path[-1]}" conflict because they have'
+                f' differing arguments',
+                other,
+                path
+            )
+
+
+def print_arguments(node):
+    return {arg.name.value: print_ast(arg.value) for arg in node.arguments}
+
+
+def get_resolver_name(ptype, snake_cases):
+    if snake_cases.startswith('__'):
+        name = f'_{snake_cases[2:]}'
+        flag = '__is_metafield__'
+    else:
+        name = snake_cases
+        flag = '__is_field__'
+    if not getattr(getattr(ptype, name, None), flag, False):
+        return None
+    return name
+
+
+def plan_arguments(node, field, path):
+    arguments, variable_arguments = {}, {}
+    for arg in node.arguments:
+        name = to_snake_case(arg.name.value)
+        slot = field.params.get(name) \
+            if isinstance(field, ResolverField) else None
+        if not slot:
+            raise RuntimeError(
+                f'Can not find {arg.name.value}'
+                f' as param in {field.name}',
+                node,
+                path
+            )
+        if contains_variable(arg.value):
+            variable_arguments[name] = (arg.value, slot)
+            continue
+        try:
+            arguments[name] = load_literal_value(arg.value, slot)
+        except Exception:
+            # Leave the error to be reported when the field is resolved
+            variable_arguments[name] = (arg.value, slot)
+    return arguments, variable_arguments
+
+
+def contains_variable(value):
+    if isinstance(value, VariableNode):
+        return True
+    elif isinstance(value, ListValueNode):
+        return any(contains_variable(v) for v in value.values)
+    elif isinstance(value, ObjectValueNode):
+        return any(contains_variable(f.value) for f in value.fields)
+    return False
+
+
+def constant(value):
+    def read(obj):
+        return value
+    return read
+
+
+def read_item(attribute, nullable):
+    """
+    Read a field of mapping source, the instances of the Object type are
+    also accepted and read by attribute. A missing optional key is null.
+    """
+    def read(obj):
+        if not isinstance(obj, Mapping):
+            return getattr(obj, attribute)
+        if nullable:
+            return obj.get(attribute)
+        return obj[attribute]
+    return read
+
+
+def read_attribute(attribute, nullable):
+    """
+    Read a field of attribute source, a missing optional attribute is null.
+    """
+    if not nullable:
+        return attrgetter(attribute)
+
+    def read(obj):
+        return getattr(obj, attribute, None)
+    return read
+
+
+def does_fragment_type_apply(schema, ptype, type_condition):
+    """
+    The fragment applies if the condition is the type itself, one of its
+    interfaces, or a union which the type is a member of.
+    """
+    if type_condition is None:
+        return True
+    name = type_condition.name.value
+    for base in ptype.__mro__:
+        if base.__name__ == name:
+            return True
+    condition = schema.get_type(name)
+    return isinstance(condition, UnionType) and ptype in condition.members
+
+
+def is_composite(ftype):
+    return isinstance(shelling_type(ftype), (InterfaceType, UnionType))
@@ -1,9 +1,12 @@
+import time
+import random
+import hashlib
 import asyncio
 import json
 import logging
 import contextvars
+from inspect import isawaitable
 from typing import TypeVar
-from abc import abstractmethod, ABC
 from graphql.language import parse
 from graphql.language.ast import (
     OperationDefinitionNode,
@@ -16,6 +19,14 @@ from pygraphy.utils import (
     patch_indents
 )
 from pygraphy.encoder import GraphQLEncoder
+from pygraphy.cache import LRUCache
+from pygraphy.subscription import (
+    SubscriptionHub,
+    Socket,
+    QueuedSocket,
+    KeepAlive,
+    Connection
+)
 from pygraphy.exceptions import ValidationError
 from pygraphy.context import Context
 from .object import ObjectType, Object
@@ -24,17 +35,21 @@ from .union import UnionType
 from .input import InputType
 from .interface import InterfaceType
 from .enum import EnumType
+from .plan import Document
+from .executor import Executor
+from .base import SCALAR_TYPES, get_validator
 
 
 class SchemaType(ObjectType):
     VALID_ROOT_TYPES = {'query', 'mutation', 'subscription'}
 
     def __new__(cls, name, bases, attrs):
-        attrs['registered_type'] = []
+        start = time.perf_counter()
         without_dataclass = type.__new__(cls, name, bases, attrs)
 
         cls = super().__new__(cls, name, bases, attrs)
-        cls.validated_type = []
+        cls.validated_type = set()
+        cls.type_map = {}
         cls.validate()
         cls.register_fields_type(cls.__fields__.values())
 
@@ -43,18 +58,49 @@ class SchemaType(ObjectType):
                 for key, field in parent.__fields__.items():
                     if key not in cls.__fields__:
                         cls.__fields__[key] = field
-            if hasattr(parent, "registered_type"):
-                existing_type_name = [t.__name__ for t in cls.registered_type]
-                for ptype in parent.registered_type:
-                    if ptype.__name__ not in existing_type_name:
-                        cls.registered_type.append(ptype)
+            for type_name, ptype in getattr(parent, "type_map", {}).items():
+                cls.type_map.setdefault(type_name, ptype)
+        cls.registered_type = list(cls.type_map.values())
+
+        cls.finalize_fields()
 
         # Schema does not need to be a dataclass
         without_dataclass.__fields__ = cls.__fields__
         without_dataclass.__description__ = cls.__description__
         without_dataclass.registered_type = cls.registered_type
+        without_dataclass.type_map = cls.type_map
+        without_dataclass.document_cache = LRUCache(
+            getattr(without_dataclass, 'DOCUMENT_CACHE_SIZE', None)
+        )
+        without_dataclass.build_time = time.perf_counter() - start
+        logging.debug(
+            f'Schema {name} with {len(cls.type_map)} types'
+            f' is built in {without_dataclass.build_time:.3f}s'
+        )
         return without_dataclass
 
+    def get_type(cls, name):
+        """
+        Return the registered type or scalar type by its GraphQL name.
+        """
+        ptype = cls.type_map.get(name)
+        if ptype is None:
+            ptype = SCALAR_TYPES.get(name)
+        return ptype
+
+    def finalize_fields(cls):
+        """
+        Resolve the types of fields, and compile the validators of their
+        return types ahead of execution.
+        """
+        for field in cls.__fields__.values():
+            field.finalize()
+            get_validator(field.ftype)
+        for ptype in cls.registered_type:
+            for field in getattr(ptype, '__fields__', {}).values():
+                field.finalize()
+                get_validator(field.ftype)
+
     def register_fields_type(cls, fields):
         param_return_types = []
         for field in fields:
@@ -67,29 +113,32 @@ class SchemaType(ObjectType):
         for ptype in types:
             if ptype in cls.validated_type:
                 continue
-            cls.validated_type.append(ptype)
+            cls.validated_type.add(ptype)
 
             if isinstance(ptype, ObjectType):
-                cls.registered_type.append(ptype)
+                cls.register_type(ptype)
                 cls.register_fields_type(ptype.__fields__.values())
             elif is_union(ptype) or is_list(ptype):
                 cls.register_types(ptype.__args__)
             elif isinstance(ptype, UnionType):
-                cls.registered_type.append(ptype)
+                cls.register_type(ptype)
                 cls.register_types(ptype.members)
             elif isinstance(ptype, InputType):
-                cls.registered_type.append(ptype)
+                cls.register_type(ptype)
                 cls.register_fields_type(ptype.__fields__.values())
             elif isinstance(ptype, InterfaceType):
-                cls.registered_type.append(ptype)
+                cls.register_type(ptype)
                 cls.register_fields_type(ptype.__fields__.values())
                 cls.register_types(ptype.__subclasses__())
             elif isinstance(ptype, EnumType):
-                cls.registered_type.append(ptype)
+                cls.register_type(ptype)
             else:
                 # Other basic types, do not need be handled
                 pass
 
+    def register_type(cls, ptype):
+        cls.type_map.setdefault(ptype.__name__, ptype)
+
     def validate(cls):
         for name, field in cls.__fields__.items():
             if name not in cls.VALID_ROOT_TYPES:
@@ -110,17 +159,46 @@ class SchemaType(ObjectType):
         ObjectType.validate(cls)
 
     def __str__(cls):
-        string = ''
-        for rtype in cls.registered_type:
-            string += (str(rtype) + '\n\n')
-        schema = (
-            f'{cls.print_description()}'
-            + f'schema '
-            + '{\n'
-            + f'{patch_indents(cls.print_field(), indent=1)}'
-            + '\n}'
-        )
-        return string + schema
+        return cls.sdl
+
+    @property
+    def sdl(cls):
+        """
+        The SDL of schema, it is rendered once since the schema does not
+        change after it is built.
+        """
+        sdl = cls.__dict__.get('_sdl')
+        if sdl is None:
+            literals = [str(rtype) for rtype in cls.type_map.values()]
+            literals.append(
+                f'{cls.print_description()}'
+                + f'schema '
+                + '{\n'
+                + f'{patch_indents(cls.print_field(), indent=1)}'
+                + '\n}'
+            )
+            sdl = cls._sdl = '\n\n'.join(literals)
+        return sdl
+
+    @property
+    def fingerprint(cls):
+        """
+        The SHA-256 hash of SDL, which only changes if the schema changes.
+        """
+        fingerprint = cls.__dict__.get('_fingerprint')
+        if fingerprint is None:
+            fingerprint = cls._fingerprint = hashlib.sha256(
+                cls.sdl.encode('utf-8')
+            ).hexdigest()
+        return fingerprint
+
+    def write_sdl(cls, path):
+        """
+        Write the SDL into a file, return the fingerprint of schema.
+        """
+        with open(path, 'w') as f:
+            f.write(cls.sdl)
+        return cls.fingerprint
 
 
 context: contextvars.ContextVar[Context] = contextvars.ContextVar('context')
@@ -132,15 +210,50 @@ class Schema(Object, metaclass=SchemaType):
         OperationType.QUERY: 'query',
         OperationType.MUTATION: 'mutation',
     }
+    DOCUMENT_CACHE_SIZE = 1024
+    CONCURRENT_RESOLUTION = False
+    MAX_CONCURRENCY = None
+    # Skip validating the return values of resolvers, except a sampled
+    # rate of requests
+    TRUST_RESULTS = False
+    VALIDATION_SAMPLE_RATE = 0.0
+
+    @classmethod
+    def parse_document(cls, query):
+        """
+        Parse the query string, the parsed documents are cached by query
+        text and shared between requests, so they must not be mutated.
+        """
+        document = cls.document_cache.get(query)
+        if document is None:
+            document = Document(parse(query))
+            cls.document_cache.set(query, document)
+        return document
 
     @classmethod
     async def execute(cls, query, variables=None, request=None, serialize=False):
-        document = parse(query)
+        document = cls.parse_document(query)
+        return await cls.execute_document(
+            document,
+            variables=variables,
+            request=request,
+            serialize=serialize
+        )
+
+    @classmethod
+    async def execute_document(cls, document, variables=None, request=None, serialize=False):
+        if serialize:
+            serialized = await cls._execute_static_document(
+                document, variables, request
+            )
+            if serialized is not None:
+                return serialized
+
         operation_result = {
             'errors': None,
             'data': None
         }
-        for definition in document.definitions:
+        for definition in document.ast.definitions:
             if not isinstance(definition, OperationDefinitionNode):
                 continue
 
@@ -153,63 +266,103 @@ class Schema(Object, metaclass=SchemaType):
                     'data': None
                 }
                 break
-            async for operation_result in cls._execute_operation(
+            operation_result = await cls._execute_operation(
                 document,
                 definition,
                 variables,
                 request
-            ):
-                pass
+            )
 
         if serialize:
             return json.dumps(operation_result, cls=GraphQLEncoder)
         else:
             return operation_result
 
+    @classmethod
+    async def _execute_static_document(cls, document, variables, request):
+        """
+        Return the cached response of a document with a single introspection
+        query, or None if the document is not static.
+        """
+        definitions = [
+            definition for definition in document.ast.definitions
+            if isinstance(definition, OperationDefinitionNode)
+        ]
+        if len(definitions) != 1 \
+           or definitions[0].operation != OperationType.QUERY \
+           or 'query' not in cls.__fields__:
+            return None
+        try:
+            plan = document.plan(cls, definitions[0])
+        except Exception:
+            # Let the normal execution report the error
+            return None
+        if not plan.static:
+            return None
+        if plan.serialized is None:
+            operation_result = await cls._execute_operation(
+                document, definitions[0], variables, request
+            )
+            serialized = json.dumps(operation_result, cls=GraphQLEncoder)
+            if operation_result['errors']:
+                return serialized
+            plan.serialized = serialized
+        return plan.serialized
+
     @classmethod
     async def _execute_operation(cls, document, definition, variables, request):
-        obj = cls.__fields__[
-            cls.OPERATION_MAP[definition.operation]
-        ].ftype.__args__[0]()
         error_collector = []
-        token = context.set(
-            Context(
-                schema=cls,
-                root_ast=document.definitions,
-                request=request,
-                variables=variables
-            )
-        )
+        executor = cls._create_executor(error_collector)
+        data = {}
+        token = context.set(cls._create_context(document, variables, request))
         try:
-            async for obj in await obj._resolve(
-                definition.selection_set.selections,
-                error_collector
-            ):
-                return_root = {
-                    'errors': error_collector if error_collector else None,
-                    'data': dict(obj) if obj else None
-                }
-                yield return_root
+            plan = document.plan(cls, definition)
+            obj = plan.root_type()
+            context.get().variable_values = plan.coerce_variables(variables)
+            if definition.operation == OperationType.MUTATION:
+                returned = await executor.resolve_serially(
+                    obj, plan.selection, data
+                )
+            else:
+                returned = executor.resolve(obj, plan.selection, data)
+                if isawaitable(returned):
+                    returned = await returned
+            return {
+                'errors': error_collector if error_collector else None,
+                'data': data if returned else None
+            }
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logging.error(e, exc_info=True)
             error_collector.append(e)
+            return {
+                'errors': error_collector,
+                'data': None
+            }
         finally:
             context.reset(token)
 
+    @classmethod
+    def _create_executor(cls, error_collector):
+        return Executor(
+            error_collector,
+            concurrent=cls.CONCURRENT_RESOLUTION,
+            semaphore=asyncio.Semaphore(cls.MAX_CONCURRENCY)
+            if cls.MAX_CONCURRENCY else None,
+            validate=not cls.TRUST_RESULTS
+            or random.random() < cls.VALIDATION_SAMPLE_RATE
+        )
 
-class Socket(ABC):
-
-    @abstractmethod
-    async def send(self, text: str):
-        pass
-
-    @abstractmethod
-    async def receive(self) -> str:
-        pass
-
-    @abstractmethod
-    async def close(self):
-        pass
+    @classmethod
+    def _create_context(cls, document, variables, request):
+        return Context(
+            schema=cls,
+            root_ast=document.ast.definitions,
+            request=request,
+            variables=variables,
+            fragments=document.fragments
+        )
 
 
 T = TypeVar("T", bound=Socket)
@@ -221,14 +374,70 @@ class SubscribableSchema(Schema):
         OperationType.MUTATION: 'mutation',
         OperationType.SUBSCRIPTION: 'subscription'
     }
+    # Execute identical subscriptions once, and broadcast their results,
+    # each subscriber buffers at most the results of queue size
+    SHARED_SUBSCRIPTIONS = False
+    SHARED_QUEUE_SIZE = 64
+    # Send the messages of a connection from a queue with the size, the
+    # policy decides what to do once it is full, see QueuedSocket
+    SEND_QUEUE_SIZE = None
+    SLOW_CONSUMER_POLICY = 'drop_oldest'
+    # The seconds to send the pending messages once a connection ends
+    FLUSH_TIMEOUT = 5
+    # The seconds between keepalive messages
+    KEEPALIVE_INTERVAL = 20
+    # Close the connection without message and subscription for the
+    # seconds, and limit the subscriptions running on a connection
+    IDLE_TIMEOUT = None
+    MAX_SUBSCRIPTIONS = None
 
     @classmethod
     async def execute(cls, socket: T):
-        subscription_router = {}
+        # The queue is only used to send, the resolvers and the scope of
+        # subscriptions still receive the original socket as request
+        queued = None
+        if cls.SEND_QUEUE_SIZE:
+            queued = QueuedSocket(
+                socket, cls.SEND_QUEUE_SIZE, cls.SLOW_CONSUMER_POLICY
+            )
+        connection = Connection(
+            queued or socket,
+            cls.get_keepalive(),
+            cls.MAX_SUBSCRIPTIONS,
+            request=socket
+        )
+        connections = cls.get_connections()
+        connections.add(connection)
+        # Disconnecting a slow client cancels the serving, which may be
+        # blocked in receiving
+        connection.serving = asyncio.current_task()
+        try:
+            await cls._serve(connection)
+        except asyncio.CancelledError:
+            if not connection.disconnected:
+                raise
+        finally:
+            connections.discard(connection)
+            await connection.close()
+            if queued:
+                await queued.flush(cls.FLUSH_TIMEOUT)
+
+    @classmethod
+    def get_connections(cls):
+        """
+        Return the set of open connections of the schema.
+        """
+        connections = cls.__dict__.get('connections')
+        if connections is None:
+            connections = cls.connections = set()
+        return connections
 
+    @classmethod
+    async def _serve(cls, connection):
+        socket = connection.socket
         while True:
             try:
-                message = await socket.receive()
+                message = await cls._receive(connection)
             except Exception:
                 await socket.close()
                 return
@@ -241,26 +450,53 @@ class SubscribableSchema(Schema):
 
             query_type, payload = data['type'], data.get('payload')
             if query_type == 'connection_init':
-                asyncio.ensure_future(cls.start_ack_loop(socket))
+                await cls.start_keepalive(socket)
             elif query_type == 'start':
                 id = data['id']
+                if connection.is_full():
+                    await cls.send_error(
+                        socket,
+                        id,
+                        f'Too many subscriptions, at most'
+                        f' {cls.MAX_SUBSCRIPTIONS} are allowed'
+                    )
+                    continue
                 variables, query = payload['variables'], payload['query']
-                task = asyncio.ensure_future(cls.subscribe(socket, id, query, variables))
-                subscription_router[id] = task
+                connection.start(
+                    id,
+                    cls.subscribe(
+                        socket, id, query, variables, connection.request
+                    )
+                )
             elif query_type == 'stop':
-                id = data['id']
-                task = subscription_router.get(id)
-                if task:
-                    task.cancel()
-                    del subscription_router[id]
+                connection.stop(data['id'])
             else:
                 await cls.send_connection_error(socket, f'Unsupported message type {repr(query_type)}')
                 return
 
     @classmethod
-    async def subscribe(cls, socket, id, query, variables):
-        document = parse(query)
-        for definition in document.definitions:
+    async def _receive(cls, connection):
+        """
+        Receive a message, raise TimeoutError if the connection has neither
+        message nor subscription for IDLE_TIMEOUT seconds.
+        """
+        if not cls.IDLE_TIMEOUT:
+            return await connection.socket.receive()
+        while True:
+            try:
+                return await asyncio.wait_for(
+                    connection.socket.receive(), cls.IDLE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                if not connection.tasks:
+                    raise
+
+    @classmethod
+    async def subscribe(cls, socket, id, query, variables, request=None):
+        if request is None:
+            request = socket
+        document = cls.parse_document(query)
+        for definition in document.ast.definitions:
             if not isinstance(definition, OperationDefinitionNode):
                 continue
 
@@ -268,22 +504,28 @@ class SubscribableSchema(Schema):
                 await cls.send_error(socket, id, 'This API does not support this operation')
                 break
 
-            async for operation_result in cls._execute_operation(
-                document, definition, variables, socket
-            ):
-                try:
-                    await socket.send(
-                        json.dumps({
-                                'type': 'data',
-                                'id': id,
-                                'payload': operation_result
-                            },
-                            cls=GraphQLEncoder
-                        )
-                    )
-                except Exception as e:
-                    logging.error(e, exc_info=True)
-                    raise
+            # The payloads are serialized once, even they are broadcast to
+            # many subscribers, only the envelope with id is different.
+            prefix = '{"type": "data", "id": ' \
+                + json.dumps(id, cls=GraphQLEncoder) \
+                + ', "payload": '
+            # The results are closed explicitly once sending fails, so the
+            # source generators are finalized at once rather than by GC
+            results = cls._operation_results(
+                document, definition, variables, request
+            )
+            try:
+                async for payload in results:
+                    try:
+                        if isinstance(socket, QueuedSocket):
+                            await socket.send(prefix + payload + '}', key=id)
+                        else:
+                            await socket.send(prefix + payload + '}')
+                    except Exception as e:
+                        logging.error(e, exc_info=True)
+                        raise
+            finally:
+                await results.aclose()
             try:
                 await socket.send(
                     json.dumps({
@@ -298,6 +540,99 @@ class SubscribableSchema(Schema):
                 raise
             break
 
+    @classmethod
+    def _operation_results(cls, document, definition, variables, request):
+        """
+        Return an asynchronous iterator of the serialized results.
+        """
+        if not cls.SHARED_SUBSCRIPTIONS \
+           or definition.operation != OperationType.SUBSCRIPTION:
+            return cls._serialize(cls._subscribe_operation(
+                document, definition, variables, request
+            ))
+        # The shared source does not belong to any connection, so it is
+        # executed without request
+        return cls.get_subscription_hub().subscribe(
+            cls._subscription_key(document, definition, variables, request),
+            lambda: cls._serialize(cls._subscribe_operation(
+                document, definition, variables, None
+            ))
+        )
+
+    @staticmethod
+    async def _serialize(operation_results):
+        try:
+            async for operation_result in operation_results:
+                yield json.dumps(operation_result, cls=GraphQLEncoder)
+        finally:
+            await operation_results.aclose()
+
+    @classmethod
+    def get_subscription_hub(cls):
+        hub = cls.__dict__.get('subscription_hub')
+        if hub is None:
+            hub = cls.subscription_hub = SubscriptionHub(
+                cls.SHARED_QUEUE_SIZE
+            )
+        return hub
+
+    @classmethod
+    def _subscription_key(cls, document, definition, variables, request):
+        return (
+            document.normalized,
+            document.ast.definitions.index(definition),
+            json.dumps(variables, sort_keys=True),
+            cls.subscription_scope(request)
+        )
+
+    @classmethod
+    def subscription_scope(cls, request):
+        """
+        Return the scope of a subscriber, the subscriptions are only shared
+        in the same scope, override it if the results depend on the user.
+        """
+        return None
+
+    @classmethod
+    async def _subscribe_operation(cls, document, definition, variables, request):
+        """
+        Yield the result every time the source stream of subscription
+        produces a value, query and mutation only yield once.
+        """
+        if definition.operation != OperationType.SUBSCRIPTION:
+            yield await cls._execute_operation(
+                document, definition, variables, request
+            )
+            return
+
+        error_collector = []
+        executor = cls._create_executor(error_collector)
+        token = context.set(cls._create_context(document, variables, request))
+        try:
+            plan = document.plan(cls, definition)
+            obj = plan.root_type()
+            context.get().variable_values = plan.coerce_variables(variables)
+            results = executor.subscribe(obj, plan.selection)
+            try:
+                async for returned, data in results:
+                    yield {
+                        'errors': error_collector if error_collector else None,
+                        'data': data if returned else None
+                    }
+            finally:
+                await results.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(e, exc_info=True)
+            error_collector.append(e)
+            yield {
+                'errors': error_collector,
+                'data': None
+            }
+        finally:
+            context.reset(token)
+
     @staticmethod
     async def send_error(socket, id, e):
         try:
@@ -339,25 +674,23 @@ class SubscribableSchema(Schema):
             logging.error(e, exc_info=True)
             raise
 
-    @staticmethod
-    async def start_ack_loop(socket, sleep=20):
+    @classmethod
+    def get_keepalive(cls):
+        keepalive = cls.__dict__.get('keepalive')
+        if keepalive is None:
+            keepalive = cls.keepalive = KeepAlive(cls.KEEPALIVE_INTERVAL)
+        return keepalive
+
+    @classmethod
+    async def start_keepalive(cls, socket):
+        """
+        Acknowledge the connection, and register it to the shared keepalive
+        scheduler, which is deregistered when the connection is closed.
+        """
         try:
-            await socket.send(
-                json.dumps({
-                    'type': 'connection_ack'
-                })
-            )
+            await socket.send(json.dumps({'type': 'connection_ack'}))
+            await socket.send(KeepAlive.MESSAGE)
         except RuntimeError:
             # socket closed
             return
-        while True:
-            try:
-                await socket.send(
-                    json.dumps({
-                        'type': 'ka'
-                    })
-                )
-            except RuntimeError:
-                # socket closed
-                return
-            await asyncio.sleep(sleep)
+        cls.get_keepalive().register(socket)
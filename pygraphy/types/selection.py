@@ -0,0 +1,63 @@
+from typing import Any, Dict, List, Optional
+from pygraphy.utils import shelling_type
+
+
+class SelectionInfo:
+    """
+    The sub-fields selected below a field. A resolver receives it through
+    a parameter annotated with `SelectionInfo`, which is not exposed as a
+    GraphQL argument, so it can look ahead what the client asks for.
+    """
+
+    def __init__(self, ptype, selection):
+        self.type = ptype
+        self.selection = selection
+
+    def fields(self, ptype=None) -> List['SelectedField']:
+        """
+        Return the selected fields, with the fragments which apply to the
+        type flattened. The type defaults to the return type of field, a
+        concrete type should be given for interfaces and unions.
+        """
+        if self.selection is None:
+            return []
+        return [
+            SelectedField(plan)
+            for plan in self.selection.fields(ptype or self.type)
+        ]
+
+    def names(self, ptype=None) -> List[str]:
+        return [selected.name for selected in self.fields(ptype)]
+
+
+class SelectedField:
+
+    def __init__(self, plan):
+        self.plan = plan
+
+    @property
+    def name(self) -> str:
+        return self.plan.field.name
+
+    @property
+    def alias(self) -> Optional[str]:
+        return self.plan.key if self.plan.node.alias else None
+
+    @property
+    def arguments(self) -> Dict[str, Any]:
+        from .executor import package_args
+        return {
+            name: value for name, value in package_args(self.plan).items()
+            if name != self.plan.field.selection_param
+        }
+
+    @property
+    def selection(self) -> SelectionInfo:
+        return SelectionInfo(
+            shelling_type(self.plan.field.ftype), self.plan.selection
+        )
+
+
+def is_selection_param(param):
+    annotation = param.annotation
+    return annotation is SelectionInfo or annotation == 'SelectionInfo'
@@ -1,12 +1,14 @@
 import json
+import hashlib
 import pathlib
 import dataclasses
+from abc import abstractmethod, ABC
 from starlette import status
 from starlette.websockets import WebSocket
 from starlette.endpoints import HTTPEndpoint, WebSocketEndpoint
 from starlette.responses import PlainTextResponse, HTMLResponse, Response
 from .introspection import WithMetaSchema, WithMetaSubSchema
-from .encoder import GraphQLEncoder
+from .cache import LRUCache
 from .types.schema import Socket
 
 
@@ -21,9 +23,71 @@ def get_playground_html(request_path: str, settings: str) -> str:
                    .replace("{{SETTINGS}}", json.dumps(settings))
 
 
+class PersistedQueryStore(ABC):
+    """
+    Storage of persisted queries, which maps the sha256 hash of query
+    text to the parsed document.
+    """
+
+    @abstractmethod
+    async def get(self, key):
+        pass
+
+    @abstractmethod
+    async def set(self, key, document):
+        pass
+
+
+class LRUPersistedQueryStore(PersistedQueryStore):
+
+    def __init__(self, maxsize=1024):
+        self.cache = LRUCache(maxsize)
+
+    async def get(self, key):
+        return self.cache.get(key)
+
+    async def set(self, key, document):
+        self.cache.set(key, document)
+
+
+class PersistedQueryError(Exception):
+    pass
+
+
 class Schema(HTTPEndpoint, WithMetaSchema):
 
     PLAYGROUND_SETTINGS = {}
+    PERSISTED_QUERY_STORE_SIZE = 1024
+
+    @classmethod
+    def get_persisted_query_store(cls):
+        """
+        Return the store of persisted queries, override it to plug
+        another storage in, an in-memory LRU store is used as default.
+        """
+        if 'persisted_query_store' not in cls.__dict__:
+            cls.persisted_query_store = LRUPersistedQueryStore(
+                cls.PERSISTED_QUERY_STORE_SIZE
+            )
+        return cls.persisted_query_store
+
+    @classmethod
+    async def load_persisted_query(cls, query, extension):
+        if extension.get('version') != 1:
+            raise PersistedQueryError('Unsupported persisted query version')
+        key = extension.get('sha256Hash')
+        if not key:
+            raise PersistedQueryError('No sha256Hash found in persisted query')
+
+        store = cls.get_persisted_query_store()
+        if query is None:
+            return await store.get(key)
+
+        if hashlib.sha256(query.encode()).hexdigest() != key:
+            raise PersistedQueryError('Provided sha256Hash does not match query')
+        document = cls.parse_document(query)
+        await store.set(key, document)
+        return document
 
     async def get(self, request):
         html = get_playground_html(request.url.path, self.PLAYGROUND_SETTINGS)
@@ -46,21 +110,51 @@ class Schema(HTTPEndpoint, WithMetaSchema):
                 status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             )
 
-        try:
-            query = data["query"]
-            variables = data.get("variables")
-        except KeyError:
+        query = data.get("query")
+        variables = data.get("variables")
+        extensions = data.get("extensions")
+        if isinstance(extensions, str):
+            extensions = json.loads(extensions)
+        persisted_query = (extensions or {}).get("persistedQuery")
+
+        if persisted_query:
+            try:
+                document = await self.load_persisted_query(
+                    query, persisted_query
+                )
+            except PersistedQueryError as e:
+                return PlainTextResponse(
+                    str(e),
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                )
+            if document is None:
+                return Response(
+                    json.dumps({
+                        "errors": [{
+                            "message": "PersistedQueryNotFound",
+                            "extensions": {
+                                "code": "PERSISTED_QUERY_NOT_FOUND"
+                            }
+                        }],
+                        "data": None
+                    }),
+                    status_code=status.HTTP_200_OK,
+                    media_type='application/json'
+                )
+        elif query is None:
             return PlainTextResponse(
                 "No GraphQL query found in the request",
                 status_code=status.HTTP_400_BAD_REQUEST,
             )
+        else:
+            document = self.parse_document(query)
 
-        result = await self.execute(
-            query, variables=variables, request=request
+        result = await self.execute_document(
+            document, variables=variables, request=request, serialize=True
         )
         status_code = status.HTTP_200_OK
         return Response(
-            json.dumps(result, cls=GraphQLEncoder),
+            result,
             status_code=status_code,
             media_type='application/json'
         )
@@ -1,7 +1,7 @@
 import pytest
 import asyncio
 import pygraphy
-from typing import Optional
+from typing import List, Optional
 
 
 pytestmark = pytest.mark.asyncio
@@ -41,3 +41,196 @@ async def test_asyncio():
 
     # Obviously, foo and bar both return False
     assert await Schema.execute(query, serialize=True) == r'{"errors": null, "data": {"foo": false, "bar": false}}'
+
+
+class Detail(pygraphy.Object):
+    id: int
+
+    @pygraphy.field
+    async def value(self) -> int:
+        Counter.running += 1
+        Counter.max_running = max(Counter.max_running, Counter.running)
+        await asyncio.sleep(0.01)
+        Counter.running -= 1
+        return self.id
+
+
+class Item(Detail):
+
+    @pygraphy.field
+    async def detail(self) -> Detail:
+        return Detail(id=self.id)
+
+
+class Counter:
+    running = 0
+    max_running = 0
+
+
+class ItemQuery(pygraphy.Query):
+
+    @pygraphy.field
+    def items(self) -> List[Item]:
+        return [Item(id=i) for i in range(10)]
+
+
+class SequentialSchema(pygraphy.Schema):
+    query: Optional[ItemQuery]
+
+
+class ConcurrentSchema(pygraphy.Schema):
+    CONCURRENT_RESOLUTION = True
+    query: Optional[ItemQuery]
+
+
+class LimitedSchema(pygraphy.Schema):
+    CONCURRENT_RESOLUTION = True
+    MAX_CONCURRENCY = 2
+    query: Optional[ItemQuery]
+
+
+async def test_concurrent_resolution():
+    query = """
+        query test {
+            items {
+                value
+            }
+        }
+    """
+    expected = {'errors': None, 'data': {'items': [{'value': i} for i in range(10)]}}
+
+    # The resolvers of all items are started together, but their
+    # sub-objects are completed one after another
+    Counter.max_running = 0
+    assert await SequentialSchema.execute(query) == expected
+    assert Counter.max_running == 10
+
+    nested = 'query test { items { detail { value } } }'
+    nested_expected = {'errors': None, 'data': {'items': [
+        {'detail': {'value': i}} for i in range(10)
+    ]}}
+    Counter.max_running = 0
+    assert await SequentialSchema.execute(nested) == nested_expected
+    assert Counter.max_running == 1
+
+    Counter.max_running = 0
+    assert await ConcurrentSchema.execute(nested) == nested_expected
+    assert Counter.max_running == 10
+
+    Counter.max_running = 0
+    assert await ConcurrentSchema.execute(query) == expected
+    assert Counter.max_running == 10
+
+    Counter.max_running = 0
+    assert await LimitedSchema.execute(query) == expected
+    assert Counter.max_running == 2
+
+
+class Mutation(pygraphy.Object):
+
+    @pygraphy.field
+    async def first(self) -> int:
+        await asyncio.sleep(0.02)
+        Counter.orders.append(1)
+        return 1
+
+    @pygraphy.field
+    async def second(self) -> int:
+        Counter.orders.append(2)
+        return 2
+
+
+class MutationSchema(pygraphy.Schema):
+    CONCURRENT_RESOLUTION = True
+    query: Optional[ItemQuery]
+    mutation: Optional[Mutation]
+
+
+async def test_serial_mutation():
+    Counter.orders = []
+    assert await MutationSchema.execute('mutation { first second }') == \
+        {'errors': None, 'data': {'first': 1, 'second': 2}}
+    assert Counter.orders == [1, 2]
+
+
+class SquareLoader(pygraphy.Loader):
+    batches = []
+
+    async def batch_load(self, keys):
+        SquareLoader.batches.append(keys)
+        return [key * key for key in keys]
+
+
+class SmallSquareLoader(SquareLoader):
+    MAX_BATCH_SIZE = 2
+
+
+class Row(pygraphy.Object):
+    id: int
+
+    @pygraphy.field
+    async def square(self) -> int:
+        return await SquareLoader.get().load(self.id % 3)
+
+    @pygraphy.field
+    async def small_square(self) -> int:
+        return await SmallSquareLoader.get().load(self.id % 3)
+
+
+class RowQuery(pygraphy.Query):
+
+    @pygraphy.field
+    def rows(self) -> List[Row]:
+        return [Row(id=i) for i in range(6)]
+
+
+class LoaderSchema(pygraphy.Schema):
+    query: Optional[RowQuery]
+
+
+async def test_loader():
+    SquareLoader.batches = []
+    result = await LoaderSchema.execute('query { rows { square } }')
+    assert result == {
+        'errors': None,
+        'data': {'rows': [{'square': (i % 3) ** 2} for i in range(6)]}
+    }
+    assert SquareLoader.batches == [[0, 1, 2]]
+
+    SquareLoader.batches = []
+    await LoaderSchema.execute('query { rows { smallSquare } }')
+    assert SquareLoader.batches == [[0, 1], [2]]
+
+
+class Leaf(pygraphy.Object):
+    x: int
+
+    @pygraphy.field
+    async def v(self) -> int:
+        await asyncio.sleep(0.01)
+        Counter.completed.append(self.x)
+        return self.x
+
+
+class FailingQuery(pygraphy.Query):
+
+    @pygraphy.field
+    async def child(self) -> Leaf:
+        return Leaf(x=1)
+
+    @pygraphy.field
+    async def bad(self) -> int:
+        raise ValueError('bad')
+
+
+class FailingSchema(pygraphy.Schema):
+    query: Optional[FailingQuery]
+
+
+async def test_failed_field_awaits_siblings():
+    Counter.completed = []
+    result = await FailingSchema.execute('query { child { v } bad }')
+    assert result['data'] is None
+    assert [e.path for e in result['errors']] == [['bad']]
+    # The sub-selection started before the failure is not left running
+    assert Counter.completed == [1]
@@ -370,3 +370,82 @@ PySchema(query: Union[tests.test_definition.test_field_name_case.<locals>.Query,
 schema {
   query: Query
 }'''
+
+
+def test_schema_sdl(tmp_path):
+    class Foo(Object):
+        a: str
+
+    class Query(Object):
+        foo: Foo
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    class OtherSchema(Schema):
+        query: Optional[Foo]
+
+    assert PySchema.sdl is PySchema.sdl
+    assert str(PySchema) is PySchema.sdl
+    assert len(PySchema.fingerprint) == 64
+    assert PySchema.fingerprint != OtherSchema.fingerprint
+
+    path = tmp_path / 'schema.graphql'
+    assert PySchema.write_sdl(str(path)) == PySchema.fingerprint
+    assert path.read_text() == str(PySchema)
+
+
+def test_compact_object():
+    class Foo(Object):
+        __compact__ = True
+        a: int
+        b: str = 'b'
+
+        @field
+        def c(self) -> int:
+            return self.a + 1
+
+    class Bar(Foo):
+        d: int = 0
+
+    foo = Foo(a=1)
+    assert not hasattr(foo, '__dict__')
+    assert (foo.a, foo.b, foo.c()) == (1, 'b', 2)
+    assert foo == Foo(1, 'b')
+    assert Bar.__slots__ == ('d',)
+    assert not hasattr(Bar(a=1), '__dict__')
+    assert {'a', 'b', 'c', 'd'} <= set(Bar.__fields__)
+
+    class Baz(Foo):
+        @field
+        def c(self) -> int:
+            return super().c() * 10
+
+    assert Baz(a=1).c() == 20
+
+
+def test_compact_object_subclasses():
+    import gc
+    gc.disable()
+    try:
+        class Node(Interface):
+            id: int
+
+        class Thing(Object, Node):
+            __compact__ = True
+            name: str = 'thing'
+
+        class Query(Object):
+            @field
+            def node(self) -> Optional[Node]:
+                return Thing(id=1)
+
+        class PySchema(Schema):
+            query: Optional[Query]
+    finally:
+        gc.enable()
+
+    # The class is created with slots at once, nothing is left behind
+    assert Node.__subclasses__() == [Thing]
+    assert PySchema.type_map['Thing'] is Thing
+    assert Thing(id=1).name == 'thing'
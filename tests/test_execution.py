@@ -1,11 +1,15 @@
 import pytest
-from typing import Optional
+from typing import List, Optional
 from pygraphy.types import (
+    Enum,
     Object,
     Input,
+    Union,
     Schema,
+    SelectionInfo,
     field
 )
+from pygraphy.types.base import get_coercer
 from examples.starwars.schema import Schema as StarwarsSchema
 from examples.simple_example import Schema as SimpleSchema
 from examples.complex_example import Schema as ComplexSchema
@@ -55,6 +59,59 @@ async def test_simple_query():
         r'{"errors": null, "data": {"patrons": [{"id": "1", "name": "Syrus", "age": 27}, {"id": "2", "name": "Syrus", "age": 27}, {"id": "3", "name": "Syrus", "age": 27}]}}'
 
 
+async def test_variable_default_value():
+    query = """
+        query something($geo: GeoInput = {lat: 1.5, lng: 2}) {
+          address(geo: $geo) {
+            latlng
+          }
+        }
+    """
+    assert await ComplexSchema.execute(query, serialize=True) == \
+        r'{"errors": null, "data": {"address": {"latlng": "(1.5,2)"}}}'
+    assert await ComplexSchema.execute(query, serialize=True, variables={"geo": {"lat": 3, "lng": 4}}) == \
+        r'{"errors": null, "data": {"address": {"latlng": "(3,4)"}}}'
+
+    document = ComplexSchema.parse_document(query)
+    plan = document.plan(ComplexSchema, document.ast.definitions[0])
+    variable, = plan.variables
+    assert variable.coercer is get_coercer(variable.ptype)
+
+
+async def test_nullable_variable_default_value():
+    class Color(Enum):
+        RED = 1
+        BLUE = 2
+
+    class Geo(Input):
+        lat: float
+
+    class Query(Object):
+        @field
+        def color(self, c: Optional[Color]) -> Optional[str]:
+            return c.name if c else None
+
+        @field
+        def lats(self, g: Optional[List[Geo]]) -> Optional[List[float]]:
+            return [geo.lat for geo in g] if g is not None else None
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    query = """
+        query something($c: Color = RED, $g: [Geo] = [{lat: 1.5}]) {
+          color(c: $c)
+          lats(g: $g)
+        }
+    """
+    assert await PySchema.execute(query) == {
+        'errors': None, 'data': {'color': 'RED', 'lats': [1.5]}
+    }
+    assert await PySchema.execute(query, variables={'c': 'BLUE'}) == {
+        'errors': None, 'data': {'color': 'BLUE', 'lats': [1.5]}
+    }
+
+
 async def test_alias_field():
     query = """
         query something {
@@ -220,3 +277,608 @@ async def test_field_name_case_with_vars():
     """
     assert await PySchema.execute(query, serialize=True, variables={"foo": {"snakeCase":"sth", "camelCase":"sth"}}) == \
         r'{"errors": null, "data": {"get_foo": {"snake_case": "sth", "camelCase": "sth"}}}'
+
+
+async def test_document_cache():
+    class Query(Object):
+        @field
+        def foo(self) -> int:
+            return 1
+
+    class PySchema(Schema):
+        DOCUMENT_CACHE_SIZE = 1
+        query: Optional[Query]
+
+    assert await PySchema.execute('query { foo }') == {'errors': None, 'data': {'foo': 1}}
+    assert await PySchema.execute('query { foo }') == {'errors': None, 'data': {'foo': 1}}
+    assert PySchema.parse_document('query { foo }') is PySchema.parse_document('query { foo }')
+    assert PySchema.document_cache.stats() == {
+        'size': 1, 'maxsize': 1, 'hits': 3, 'misses': 1, 'evictions': 0
+    }
+
+    await PySchema.execute('{ foo }')
+    assert PySchema.document_cache.evictions == 1
+    assert '{ foo }' in PySchema.document_cache
+    assert 'query { foo }' not in PySchema.document_cache
+
+
+async def test_execution_plan_cache():
+    query = """
+        query something {
+          user: patron {
+            id
+            name
+          }
+        }
+    """
+    assert await SimpleSchema.execute(query) == {
+        'errors': None, 'data': {'user': {'id': '1', 'name': 'Syrus'}}
+    }
+    document = SimpleSchema.parse_document(query)
+    definition = document.ast.definitions[0]
+    plan = document.plan(SimpleSchema, definition)
+    assert document.plan(SimpleSchema, definition) is plan
+
+    root_fields = plan.selection.fields(plan.root_type)
+    assert [(p.key, p.name, p.resolver) for p in root_fields] == [('user', 'patron', 'patron')]
+    patron_type = root_fields[0].field.ftype
+    assert [(p.key, p.attribute) for p in root_fields[0].selection.fields(patron_type)] == \
+        [('id', 'id'), ('name', 'name')]
+
+    assert await SimpleSchema.execute(query) == {
+        'errors': None, 'data': {'user': {'id': '1', 'name': 'Syrus'}}
+    }
+    assert root_fields[0].selection.fields(patron_type) is \
+        root_fields[0].selection.fields(patron_type)
+
+
+async def test_fragment_spreads():
+    query = """
+        query something {
+          patron {
+            ...PatronName
+            ...PatronAge
+          }
+        }
+
+        fragment PatronName on Patron {
+          name
+        }
+
+        fragment PatronAge on Patron {
+          age
+        }
+    """
+    assert await SimpleSchema.execute(query) == {
+        'errors': None, 'data': {'patron': {'name': 'Syrus', 'age': 27}}
+    }
+    document = SimpleSchema.parse_document(query)
+    assert set(document.fragments) == {'PatronName', 'PatronAge'}
+
+
+async def test_union_fragment():
+    class Foo(Object):
+        a: str
+
+    class Bar(Object):
+        b: str
+
+    class FooBar(Union):
+        members = (Foo, Bar)
+
+    class Query(Object):
+        @field
+        def foobar(self) -> List[FooBar]:
+            return [Foo(a='a'), Bar(b='b')]
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    query = """
+        query {
+          foobar {
+            ...Typename
+            ... on FooBar {
+              ... on Foo { a }
+            }
+          }
+        }
+
+        fragment Typename on FooBar {
+          __typename
+        }
+    """
+    assert await PySchema.execute(query) == {
+        'errors': None,
+        'data': {'foobar': [
+            {'__typename': 'Foo', 'a': 'a'}, {'__typename': 'Bar'}
+        ]}
+    }
+
+
+async def test_merge_duplicate_selections():
+    calls = []
+
+    class Foo(Object):
+        a: str
+        b: str
+
+    class Query(Object):
+        @field
+        def foo(self) -> Foo:
+            calls.append('foo')
+            return Foo(a='a', b='b')
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    query = """
+        query something {
+          foo {
+            a
+          }
+          ... on Query {
+            foo {
+              b
+            }
+          }
+          ...FooFields
+        }
+
+        fragment FooFields on Query {
+          foo {
+            a
+          }
+        }
+    """
+    assert await PySchema.execute(query) == {
+        'errors': None, 'data': {'foo': {'a': 'a', 'b': 'b'}}
+    }
+    assert calls == ['foo']
+
+    query = """
+        query something {
+          foo {
+            a
+          }
+          foo: foo {
+            b
+          }
+          bar: foo {
+            b
+          }
+        }
+    """
+    assert await PySchema.execute(query) == {
+        'errors': None, 'data': {'foo': {'a': 'a', 'b': 'b'}, 'bar': {'b': 'b'}}
+    }
+    assert calls == ['foo', 'foo', 'foo']
+
+
+async def test_batch_resolver():
+    calls = []
+
+    class Row(Object):
+        id: int
+
+        @field(batch=True)
+        def double(rows, base: int = 0) -> int:
+            calls.append(len(rows))
+            return [base + row.id * 2 for row in rows]
+
+        @field(batch=True)
+        async def triple(rows) -> int:
+            calls.append(len(rows))
+            return [row.id * 3 for row in rows]
+
+    class Query(Object):
+        @field
+        def rows(self) -> List[Row]:
+            return [Row(id=i) for i in range(4)]
+
+        @field
+        def row(self) -> Row:
+            return Row(id=5)
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    query = """
+        query {
+          rows {
+            double(base: 1)
+            triple
+          }
+          row {
+            double
+          }
+        }
+    """
+    assert await PySchema.execute(query) == {
+        'errors': None,
+        'data': {
+            'rows': [{'double': 1 + i * 2, 'triple': i * 3} for i in range(4)],
+            'row': {'double': 10}
+        }
+    }
+    assert sorted(calls) == [1, 4, 4]
+
+
+async def test_batch_resolver_length():
+    class Row(Object):
+        id: int
+
+        @field(batch=True)
+        def short(rows) -> Optional[int]:
+            return [1]
+
+        @field(batch=True)
+        async def async_short(rows) -> Optional[int]:
+            return [1]
+
+    class Query(Object):
+        @field
+        def rows(self) -> List[Row]:
+            return [Row(id=i) for i in range(3)]
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    # A wrong result of batch is reported once, rather than for each row
+    for name in ('short', 'asyncShort'):
+        result = await PySchema.execute(f'query {{ rows {{ {name} }} }}')
+        assert result['data'] == {'rows': [{name: None}] * 3}
+        assert len(result['errors']) == 1
+        assert 'same length' in str(result['errors'][0])
+
+
+async def test_argument_evaluation():
+    received = []
+
+    class Row(Object):
+        id: int
+
+        @field
+        def pick(self, ids: List[int], extra: List[int]) -> bool:
+            received.append((ids, extra))
+            return self.id in ids + extra
+
+    class Query(Object):
+        @field
+        def rows(self) -> List[Row]:
+            return [Row(id=i) for i in range(3)]
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    query = """
+        query something($extra: [Int!]!) {
+          rows {
+            pick(ids: [0], extra: $extra)
+          }
+        }
+    """
+    for extra in ([1], [2]):
+        assert await PySchema.execute(query, variables={'extra': extra}) == {
+            'errors': None,
+            'data': {
+                'rows': [{'pick': i in [0] + extra} for i in range(3)]
+            }
+        }
+    # Literal arguments are evaluated once for all requests, and the
+    # arguments with variables are evaluated once for each request
+    assert len({id(ids) for ids, _ in received}) == 1
+    assert len({id(extra) for _, extra in received}) == 2
+
+
+async def test_selection_info():
+    seen = []
+
+    class Friend(Object):
+        id: int
+
+    class Row(Object):
+        id: int
+        name: str
+
+        @field
+        def friends(self, first: int) -> List[Friend]:
+            return []
+
+    class Query(Object):
+        @field
+        def rows(self, info: SelectionInfo, limit: int) -> List[Row]:
+            seen.append([
+                (f.name, f.alias, f.arguments, f.selection.names())
+                for f in info.fields()
+            ])
+            return [Row(id=i, name=str(i)) for i in range(limit)]
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    assert 'info' not in PySchema.type_map['Query'].__fields__['rows'].params
+    query = """
+        query something($first: Int!) {
+          rows(limit: 1) {
+            key: id
+            ...on Row {
+              name
+            }
+            friends(first: $first) {
+              id
+            }
+          }
+        }
+    """
+    assert await PySchema.execute(query, variables={'first': 2}) == {
+        'errors': None,
+        'data': {'rows': [{'key': 0, 'name': '0', 'friends': []}]}
+    }
+    assert seen == [[
+        ('id', 'key', {}, []),
+        ('name', None, {}, []),
+        ('friends', None, {'first': 2}, ['id'])
+    ]]
+
+
+async def test_source_objects():
+    class Row:
+        def __init__(self, id):
+            self.id = id
+
+    class Address(Object):
+        __source__ = 'attribute'
+        id: int
+
+        @field
+        def street(self) -> str:
+            return f'street {self.id}'
+
+    class User(Object):
+        __source__ = 'mapping'
+        id: int
+        first_name: str
+
+        @field
+        def address(self) -> Address:
+            return Row(self['id'])
+
+        @field(batch=True)
+        def rank(users) -> int:
+            return [user['id'] * 10 for user in users]
+
+    class Query(Object):
+        @field
+        def users(self) -> List[User]:
+            return [{'id': i, 'first_name': str(i)} for i in range(2)]
+
+        @field
+        def user(self) -> Optional[User]:
+            return {'id': 5, 'first_name': 'five'}
+
+        @field
+        def invalid(self) -> Optional[User]:
+            return 5
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    query = """
+        query {
+          users {
+            __typename
+            id
+            firstName
+            rank
+            address {
+              __typename
+              street
+            }
+          }
+          user {
+            firstName
+          }
+        }
+    """
+    assert await PySchema.execute(query) == {
+        'errors': None,
+        'data': {
+            'users': [{
+                '__typename': 'User',
+                'id': i,
+                'firstName': str(i),
+                'rank': i * 10,
+                'address': {'__typename': 'Address', 'street': f'street {i}'}
+            } for i in range(2)],
+            'user': {'firstName': 'five'}
+        }
+    }
+
+    result = await PySchema.execute('query { invalid { id } }')
+    assert result['data'] is None
+    assert 'not a valid return value' in str(result['errors'][0])
+
+
+async def test_source_read_errors():
+    class Row:
+        id = 1
+
+    class Address(Object):
+        __source__ = 'attribute'
+        id: int
+        street: Optional[str]
+
+    class User(Object):
+        __source__ = 'mapping'
+        id: int
+        nickname: Optional[str]
+
+    class Query(Object):
+        @field
+        def user(self) -> Optional[User]:
+            return {'nickname': 'five'}
+
+        @field
+        def partial(self) -> User:
+            return {'id': 5}
+
+        @field
+        def instance(self) -> User:
+            return User(id=6, nickname=None)
+
+        @field
+        def address(self) -> Optional[Address]:
+            return Row()
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    result = await PySchema.execute(
+        'query { partial { id nickname } instance { id nickname } address { id street } }'
+    )
+    assert result == {
+        'errors': None,
+        'data': {
+            'partial': {'id': 5, 'nickname': None},
+            'instance': {'id': 6, 'nickname': None},
+            'address': {'id': 1, 'street': None}
+        }
+    }
+
+    result = await PySchema.execute('query { user { id nickname } }')
+    assert result['data'] == {'user': None}
+    assert len(result['errors']) == 1
+    assert result['errors'][0].path == ['user', 'id']
+    assert result['errors'][0].location is not None
+
+
+async def test_null_propagation():
+    class Leaf(Object):
+        x: int
+
+    class Child(Object):
+        @field
+        def boom(self) -> Optional[int]:
+            raise ValueError('boom')
+
+        @field
+        def bad(self) -> int:
+            return None
+
+        @field
+        async def other(self) -> Leaf:
+            return Leaf(x=1)
+
+    class Parent(Object):
+        @field
+        def child(self) -> Child:
+            return Child()
+
+    class Query(Object):
+        @field
+        def child(self) -> Optional[Child]:
+            return Child()
+
+        @field
+        def parent(self) -> Optional[Parent]:
+            return Parent()
+
+        @field
+        def children(self) -> Optional[List[Optional[Child]]]:
+            return [Child(), None]
+
+        @field
+        def strict_children(self) -> Optional[List[Child]]:
+            return [Child()]
+
+        @field
+        def required(self) -> Child:
+            return Child()
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    selection = '{ boom bad other { x } }'
+    result = await PySchema.execute(
+        f'query {{ child {selection} parent {{ child {selection} }}'
+        f' children {selection} strictChildren {selection} }}',
+        serialize=True
+    )
+    assert '"data": {"child": null, "parent": null, "children": [null, null], "strictChildren": null}' in result
+
+    result = await PySchema.execute(f'query {{ required {selection} }}')
+    assert result['data'] is None
+
+
+async def test_synchronous_fast_path():
+    from pygraphy.types import context
+
+    query = """
+        query {
+          patrons(ids: [1, 2]) {
+            id
+          }
+        }
+    """
+    document = SimpleSchema.parse_document(query)
+    plan = document.plan(SimpleSchema, document.ast.definitions[0])
+    obj = plan.root_type()
+    output = {}
+    token = context.set(SimpleSchema._create_context(document, None, None))
+    try:
+        executor = SimpleSchema._create_executor([])
+        assert executor.resolve(obj, plan.selection, output) is True
+    finally:
+        context.reset(token)
+    assert output == {'patrons': [{'id': '1'}, {'id': '2'}]}
+    assert not hasattr(obj, 'resolve_results')
+
+
+async def test_invalid_return_value():
+    class Query(Object):
+        @field
+        def foo(self) -> int:
+            return 'foo'
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    assert await PySchema.execute('query { foo }', serialize=True) == \
+        '{"errors": [{"message": "foo is not a valid return value to foo, please check foo\'s type annotation", "locations": [{"line": 1, "column": 9}], "path": ["foo"]}], "data": null}'
+
+
+async def test_trust_results():
+    class Query(Object):
+        @field
+        def foo(self) -> List[int]:
+            return [1, 'foo']
+
+        @field
+        def bar(self) -> int:
+            return None
+
+    class PySchema(Schema):
+        query: Optional[Query]
+
+    class TrustedSchema(Schema):
+        TRUST_RESULTS = True
+        query: Optional[Query]
+
+    class SampledSchema(TrustedSchema):
+        VALIDATION_SAMPLE_RATE = 1.0
+
+    result = await PySchema.execute('query { foo }')
+    assert result['data'] is None
+    assert 'not a valid return value' in str(result['errors'][0])
+
+    assert await TrustedSchema.execute('query { foo }') == {
+        'errors': None,
+        'data': {'foo': [1, 'foo']}
+    }
+    result = await SampledSchema.execute('query { foo }')
+    assert result['data'] is None
+
+    # Null is still checked for non-null fields
+    result = await TrustedSchema.execute('query { bar }')
+    assert result['data'] is None
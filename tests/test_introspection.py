@@ -115,3 +115,59 @@ async def test_introspection():
         assert result1 == f.readline()[:-1]
         result2 = await ComplexSchema.execute(query, serialize=True)
         assert result2 == f.readline()[:-1]
+
+
+async def test_type_lookup():
+    query = """
+    query {
+      __type(name: "Human") {
+        name
+        kind
+      }
+      string: __type(name: "String") {
+        name
+        kind
+      }
+      unknown: __type(name: "Unknown") {
+        name
+      }
+    }
+    """
+    assert await Schema.execute(query, serialize=True) == \
+        '{"errors": null, "data": {"__type": {"name": "Human", "kind": "OBJECT"},' \
+        ' "string": {"name": "String", "kind": "SCALAR"}, "unknown": null}}'
+    assert Schema.get_type('Episode') is Schema.type_map['Episode']
+    assert Schema.build_time > 0
+
+
+async def test_cached_introspection():
+    query = """
+    query {
+      __schema {
+        queryType {
+          name
+        }
+      }
+    }
+    """
+    result = await Schema.execute(query, serialize=True)
+    assert result == '{"errors": null, "data": {"__schema": {"queryType": {"name": "Query"}}}}'
+    document = Schema.parse_document(query)
+    plan = document.plan(Schema, document.ast.definitions[0])
+    assert plan.static and plan.serialized == result
+    assert await Schema.execute(query, serialize=True) is plan.serialized
+
+    query = """
+    query {
+      __type(name: "Human") {
+        name
+      }
+      hero {
+        name
+      }
+    }
+    """
+    await Schema.execute(query, serialize=True)
+    document = Schema.parse_document(query)
+    plan = document.plan(Schema, document.ast.definitions[0])
+    assert not plan.static and plan.serialized is None
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import pygraphy
 from typing import Optional
 
@@ -20,3 +21,23 @@ class Schema(pygraphy.Schema):
 
 def test_recursive_definition():
     print(str(Schema))
+
+
+def test_resolve_forward_reference_once(monkeypatch):
+    field = WhereInput.__fields__['_and']
+    assert field.ftype == Optional[WhereInput]
+    assert Query.__fields__['foo'].params == {'arg': WhereInput}
+
+    def fail(*args):
+        raise AssertionError('Forward reference is evaluated again')
+
+    monkeypatch.setattr(pygraphy.types.Field, 'replace_forwarded_type', fail)
+    assert field.ftype == Optional[WhereInput]
+    loop = asyncio.new_event_loop()
+    try:
+        result = loop.run_until_complete(
+            Schema.execute('query { foo(arg: {_and: null}) }')
+        )
+    finally:
+        loop.close()
+    assert result == {'errors': None, 'data': {'foo': 0}}
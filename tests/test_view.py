@@ -39,3 +39,33 @@ def test_error(client):
     response = client.post(
         '/', data=json.dumps(content), headers={'content-type': 'application/text'})
     assert response.status_code == 415
+
+
+def test_persisted_query(client):
+    import hashlib
+    query = "{\n  human(id: \"1\") {\n    name\n  }\n}\n"
+    extensions = {
+        'persistedQuery': {
+            'version': 1,
+            'sha256Hash': hashlib.sha256(query.encode()).hexdigest()
+        }
+    }
+    headers = {'content-type': 'application/json'}
+
+    response = client.post(
+        '/', data=json.dumps({'extensions': extensions}), headers=headers)
+    assert response.status_code == 200
+    assert response.json()['errors'][0]['message'] == 'PersistedQueryNotFound'
+
+    response = client.post(
+        '/', data=json.dumps({'query': query, 'extensions': extensions}), headers=headers)
+    assert response.json() == {'errors': None, 'data': {'human': {'name': 'foo'}}}
+
+    response = client.post(
+        '/', data=json.dumps({'extensions': extensions}), headers=headers)
+    assert response.json() == {'errors': None, 'data': {'human': {'name': 'foo'}}}
+
+    extensions['persistedQuery']['sha256Hash'] = 'foo'
+    response = client.post(
+        '/', data=json.dumps({'query': query, 'extensions': extensions}), headers=headers)
+    assert response.status_code == 400
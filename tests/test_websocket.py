@@ -1,7 +1,11 @@
 import os
 import json
+import asyncio
 import pytest
+from typing import Optional
 from starlette.testclient import TestClient
+from pygraphy.types import Object, Socket, SubscribableSchema, field
+from pygraphy.subscription import QueuedSocket, KeepAlive, SubscriptionHub
 
 
 @pytest.fixture()
@@ -138,3 +142,341 @@ def test_query(client):
         path = '/'.join(os.path.abspath(__file__).split('/')[:-1])
         with open(f'{path}/subscription_introspection', 'r') as f:
             assert data == f.read()[:-1]
+
+
+class MemorySocket(Socket):
+
+    def __init__(self):
+        self.sent = []
+        self.messages = asyncio.Queue()
+
+    async def send(self, text):
+        self.sent.append(json.loads(text))
+
+    async def receive(self):
+        return await self.messages.get()
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_shared_subscription(monkeypatch):
+    starts = []
+    encoded = []
+    dumps = json.dumps
+
+    def counting_dumps(obj, *args, **kwargs):
+        if isinstance(obj, dict) and 'data' in obj:
+            encoded.append(obj)
+        return dumps(obj, *args, **kwargs)
+
+    class Subscription(Object):
+        @field
+        async def ticker(self, symbol: str) -> int:
+            starts.append(symbol)
+            for i in range(3):
+                await asyncio.sleep(0.01)
+                yield i
+
+    class PySchema(SubscribableSchema):
+        SHARED_SUBSCRIPTIONS = True
+        subscription: Optional[Subscription]
+
+    query = 'subscription { ticker(symbol: "X") }'
+    sockets = [MemorySocket() for _ in range(3)]
+    monkeypatch.setattr(json, 'dumps', counting_dumps)
+    await asyncio.gather(*[
+        PySchema.subscribe(socket, i, query, {})
+        for i, socket in enumerate(sockets)
+    ])
+    monkeypatch.undo()
+    assert starts == ['X']
+    # Each payload is serialized once for all subscribers
+    assert len(encoded) == 3
+    for i, socket in enumerate(sockets):
+        assert socket.sent == [
+            {'type': 'data', 'id': i, 'payload': {'data': {'ticker': n}, 'errors': None}}
+            for n in range(3)
+        ] + [{'type': 'complete', 'id': i}]
+    assert PySchema.get_subscription_hub().stats() == {
+        'streams': 0, 'subscribers': 0, 'dropped': 0
+    }
+
+    # The source is cancelled once all subscribers stop
+    task = asyncio.ensure_future(PySchema.subscribe(sockets[0], 0, query, {}))
+    await asyncio.sleep(0)
+    assert PySchema.get_subscription_hub().stats()['subscribers'] == 1
+    task.cancel()
+    await asyncio.sleep(0)
+    assert PySchema.get_subscription_hub().stats() == {
+        'streams': 0, 'subscribers': 0, 'dropped': 0
+    }
+
+
+@pytest.mark.asyncio
+async def test_shared_subscription_buffer():
+    async def source():
+        for i in range(5):
+            yield i
+
+    hub = SubscriptionHub(2)
+    results = hub.subscribe('ticker', source)
+    # The source runs ahead of the subscriber, which keeps the latest
+    # results only
+    await asyncio.sleep(0)
+    assert [result async for result in results] == [4]
+    assert hub.stats() == {'streams': 0, 'subscribers': 0, 'dropped': 4}
+
+
+class SlowSocket(MemorySocket):
+
+    def __init__(self):
+        super().__init__()
+        self.unblock = asyncio.Event()
+
+    async def send(self, text):
+        await self.unblock.wait()
+        self.sent.append(text)
+
+
+@pytest.mark.asyncio
+async def test_queued_socket():
+    for policy, expected, stats in [
+        ('drop_oldest', ['ack', 'b1', 'a2'], {'dropped': 2, 'conflated': 0}),
+        ('conflate', ['ack', 'b1', 'a2'], {'dropped': 1, 'conflated': 1}),
+    ]:
+        slow = SlowSocket()
+        socket = QueuedSocket(slow, 2, policy)
+        await socket.send('ack')
+        # The writer is blocked in sending the first message
+        await asyncio.sleep(0)
+        for text, key in [('a0', 'a'), ('a1', 'a'), ('b1', 'b'), ('a2', 'a')]:
+            await socket.send(text, key=key)
+        assert socket.stats()['depth'] == 2
+        slow.unblock.set()
+        await socket.flush()
+        assert slow.sent == expected
+        assert socket.stats() == dict(stats, depth=0, sent=3)
+
+    slow = SlowSocket()
+    socket = QueuedSocket(slow, 1, 'disconnect')
+    await socket.send('a0', key='a')
+    await asyncio.sleep(0)
+    await socket.send('a1', key='a')
+    with pytest.raises(RuntimeError):
+        await socket.send('a2', key='a')
+    assert socket.closed
+
+    # The control messages count toward the size, they replace the data
+    # messages, and disconnect the client once the queue is full of them
+    slow = SlowSocket()
+    socket = QueuedSocket(slow, 2)
+    await socket.send('ack')
+    await asyncio.sleep(0)
+    for text, key in [('a0', 'a'), ('ka', None), ('ka', None)]:
+        await socket.send(text, key=key)
+    assert socket.stats() == {'depth': 2, 'sent': 0, 'dropped': 1, 'conflated': 0}
+    with pytest.raises(RuntimeError):
+        await socket.send('complete')
+    assert socket.closed
+
+    # A hung client does not block flushing forever
+    slow = SlowSocket()
+    socket = QueuedSocket(slow, 2)
+    await socket.send('ack')
+    await asyncio.wait_for(socket.flush(0.01), 1)
+    assert socket.closed and slow.sent == []
+
+
+@pytest.mark.asyncio
+async def test_execute_with_send_queue():
+    from pygraphy.types import context
+    requests = []
+
+    class Query(Object):
+        @field
+        def foo(self) -> int:
+            requests.append(context.get().request)
+            return 1
+
+    class PySchema(SubscribableSchema):
+        SEND_QUEUE_SIZE = 8
+        query: Optional[Query]
+
+    socket = MemorySocket()
+    socket.messages.put_nowait(json.dumps({
+        'type': 'start', 'id': 1, 'payload': {'query': 'query { foo }', 'variables': {}}
+    }))
+    asyncio.get_event_loop().call_later(
+        0.05, socket.messages.put_nowait, json.dumps({'type': 'unknown'})
+    )
+    task = asyncio.ensure_future(PySchema.execute(socket))
+    await asyncio.sleep(0.02)
+    # The resolvers receive the original socket, not the queue
+    assert requests == [socket]
+    connection, = PySchema.get_connections()
+    assert connection.stats() == {
+        'subscriptions': 0, 'depth': 0, 'sent': 2, 'dropped': 0, 'conflated': 0
+    }
+    await task
+    assert PySchema.get_connections() == set()
+    assert socket.sent[:2] == [
+        {'type': 'data', 'id': 1, 'payload': {'data': {'foo': 1}, 'errors': None}},
+        {'type': 'complete', 'id': 1}
+    ]
+    assert socket.sent[2]['type'] == 'connection_error'
+
+
+@pytest.mark.asyncio
+async def test_disconnect_slow_client():
+    running = []
+
+    class Subscription(Object):
+        @field
+        async def ticker(self) -> int:
+            running.append(True)
+            try:
+                while True:
+                    await asyncio.sleep(0)
+                    yield 1
+            finally:
+                running.pop()
+
+    class PySchema(SubscribableSchema):
+        SEND_QUEUE_SIZE = 2
+        SLOW_CONSUMER_POLICY = 'disconnect'
+        subscription: Optional[Subscription]
+
+    # The client neither reads nor sends, the connection is closed once
+    # its queue is full, even if the receive is blocked
+    socket = SlowSocket()
+    socket.messages.put_nowait(json.dumps({
+        'type': 'start', 'id': 1,
+        'payload': {'query': 'subscription { ticker }', 'variables': {}}
+    }))
+    await asyncio.wait_for(PySchema.execute(socket), 1)
+    assert PySchema.get_connections() == set()
+    assert running == []
+
+
+class ClosedSocket(MemorySocket):
+
+    async def send(self, text):
+        raise RuntimeError('closed')
+
+
+@pytest.mark.asyncio
+async def test_keepalive():
+    keepalive = KeepAlive(interval=0.01, batch_size=2)
+    sockets = [MemorySocket() for _ in range(3)]
+    closed = ClosedSocket()
+    for socket in sockets + [closed]:
+        keepalive.register(socket)
+    task = keepalive.task
+    await asyncio.sleep(0.015)
+    for socket in sockets:
+        assert socket.sent and all(m == {'type': 'ka'} for m in socket.sent)
+    assert len(keepalive.sockets) == 3
+
+    # A hung socket is deregistered, without stalling the others
+    hung = SlowSocket()
+    keepalive.register(hung)
+    counts = [len(socket.sent) for socket in sockets]
+    await asyncio.sleep(0.05)
+    for socket, count in zip(sockets, counts):
+        assert len(socket.sent) >= count + 2
+    assert id(hung) not in keepalive.sockets
+
+    for socket in sockets:
+        keepalive.unregister(socket)
+    await asyncio.sleep(0.05)
+    # The single task stops once there is no socket
+    assert keepalive.task is task and task.done()
+
+    class Query(Object):
+        @field
+        def foo(self) -> int:
+            return 1
+
+    class PySchema(SubscribableSchema):
+        query: Optional[Query]
+
+    socket = MemorySocket()
+    socket.messages.put_nowait(json.dumps({'type': 'connection_init'}))
+    socket.messages.put_nowait(json.dumps({'type': 'unknown'}))
+    await PySchema.execute(socket)
+    assert [message['type'] for message in socket.sent] == [
+        'connection_ack', 'ka', 'connection_error'
+    ]
+    assert PySchema.get_keepalive().sockets == {}
+
+
+@pytest.mark.asyncio
+async def test_connection_lifecycle():
+    running = []
+
+    class Subscription(Object):
+        @field
+        async def ticker(self) -> int:
+            running.append(True)
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield 1
+            finally:
+                running.pop()
+
+    class PySchema(SubscribableSchema):
+        IDLE_TIMEOUT = 0.05
+        MAX_SUBSCRIPTIONS = 1
+        subscription: Optional[Subscription]
+
+    def start(id):
+        return json.dumps({
+            'type': 'start', 'id': id,
+            'payload': {'query': 'subscription { ticker }', 'variables': {}}
+        })
+
+    class DisconnectedSocket(MemorySocket):
+        async def receive(self):
+            message = await self.messages.get()
+            if message is None:
+                raise RuntimeError('disconnected')
+            return message
+
+    # The subscriptions are cancelled once the client is disconnected
+    socket = DisconnectedSocket()
+    socket.messages.put_nowait(start(1))
+    socket.messages.put_nowait(start(2))
+    loop = asyncio.get_event_loop()
+    loop.call_later(0.1, socket.messages.put_nowait, None)
+    await PySchema.execute(socket)
+    assert running == []
+    assert {'type': 'error', 'id': 2, 'payload': {
+        'errors': {'message': 'Too many subscriptions, at most 1 are allowed'},
+        'data': None
+    }} in socket.sent
+    assert {m['type'] for m in socket.sent} == {'data', 'error'}
+
+    # The send queue is not flushed once the connection is closed
+    class QueuedSchema(PySchema):
+        SEND_QUEUE_SIZE = 4
+
+    for messages in [[None], [start(1)]]:
+        socket = DisconnectedSocket()
+        for message in messages:
+            socket.messages.put_nowait(message)
+        loop.call_later(0.05, socket.messages.put_nowait, None)
+        await QueuedSchema.execute(socket)
+        assert running == []
+        assert {m['type'] for m in socket.sent} <= {'data'}
+
+    # An idle connection is closed, but not while a subscription is running
+    socket = MemorySocket()
+    socket.messages.put_nowait(start(1))
+    loop.call_later(0.1, socket.messages.put_nowait, json.dumps({'type': 'stop', 'id': 1}))
+    start_time = loop.time()
+    await PySchema.execute(socket)
+    assert loop.time() - start_time >= 0.15
+    assert running == []